@@ -0,0 +1,59 @@
+import random
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import date, timedelta
+from itertools import islice
+
+from saasy.models import MAX_RENEWAL_GAP_DAYS, Contract
+
+
+@dataclass(frozen=True, slots=True)
+class GeneratorConfig:
+    customers: int = 1000
+    max_contracts_per_customer: int = 10
+    renewal_rate: float = 0.85
+    # Gap in days between a contract ending and its renewal starting, drawn
+    # around MAX_RENEWAL_GAP_DAYS so that renewals, early renewals and
+    # churn followed by new business all occur
+    min_gap_days: int = -MAX_RENEWAL_GAP_DAYS
+    max_gap_days: int = 2 * MAX_RENEWAL_GAP_DAYS
+    expansion_rate: float = 0.25
+    downsell_rate: float = 0.1
+    first_start: date = date(2010, 1, 1)
+    start_window_days: int = 10 * 365
+    term_days: tuple[int, ...] = (182, 365, 365, 365, 730)
+
+
+def generate_contracts(config: GeneratorConfig, seed: int = 0) -> list[Contract]:
+    return list(iter_contracts(config, seed))
+
+
+def generate_n_contracts(n: int, seed: int = 0, **kwargs) -> list[Contract]:
+    # Every customer has at least one contract so n customers is always enough
+    config = GeneratorConfig(customers=n, **kwargs)
+    return list(islice(iter_contracts(config, seed), n))
+
+
+def iter_contracts(config: GeneratorConfig, seed: int = 0) -> Iterator[Contract]:
+    rng = random.Random(seed)
+    for customer in range(config.customers):
+        customer_id = f"customer-{customer}"
+        start = config.first_start + timedelta(
+            days=rng.randrange(config.start_window_days)
+        )
+        acv = float(rng.randint(1, 200) * 500)
+        for _ in range(config.max_contracts_per_customer):
+            term = rng.choice(config.term_days)
+            end = start + timedelta(days=term - 1)
+            tcv = acv * round(term / 365.0, 1)
+            yield Contract(customer_id, start, end, tcv)
+
+            if rng.random() >= config.renewal_rate:
+                break
+            change = rng.random()
+            if change < config.expansion_rate:
+                acv *= 1 + rng.randint(1, 10) / 10
+            elif change < config.expansion_rate + config.downsell_rate:
+                acv *= 1 - rng.randint(1, 5) / 10
+            gap = rng.randint(config.min_gap_days, config.max_gap_days)
+            start = end + timedelta(days=1 + gap)
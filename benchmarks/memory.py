@@ -0,0 +1,75 @@
+import argparse
+import gc
+import sys
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from benchmarks.generator import generate_n_contracts
+from saasy.models import (
+    ArrEventStream,
+    ArrIntervalTimeline,
+    Contract,
+    ContractEventStream,
+)
+
+
+def measure(build: Callable[[], list[Any]]) -> tuple[list[Any], int]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return objects, after - before
+
+
+def instance_size(obj: Any) -> int:
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bytes per model object")
+    parser.add_argument("-n", "--contracts", type=int, default=100_000)
+    args = parser.parse_args()
+
+    contracts, contract_bytes = measure(lambda: generate_n_contracts(args.contracts))
+    customers: dict[str, list[Contract]] = {}
+    for contract in contracts:
+        customers.setdefault(contract.customer_id, []).append(contract)
+
+    contract_events, contract_event_bytes = measure(
+        lambda: [ce for cs in customers.values() for ce in ContractEventStream(cs)]
+    )
+    arr_streams = [ArrEventStream(ContractEventStream(cs)) for cs in customers.values()]
+    arr_events, arr_event_bytes = measure(
+        lambda: [
+            type(ae)(ae.contract_event, ae.event_type, ae.arr_change)
+            for s in arr_streams
+            for ae in s
+        ]
+    )
+    intervals, interval_bytes = measure(
+        lambda: [i for s in arr_streams for i in ArrIntervalTimeline(s)]
+    )
+
+    # bytes/object includes everything allocated for the objects (dates, floats,
+    # intervals) while instance is the object itself including any __dict__
+    print(f"{'object':<16}{'count':>10}{'bytes/object':>15}{'instance':>10}")
+    for name, objects, total in (
+        ("Contract", contracts, contract_bytes),
+        ("ContractEvent", contract_events, contract_event_bytes),
+        ("ArrEvent", arr_events, arr_event_bytes),
+        ("ArrInterval", intervals, interval_bytes),
+    ):
+        print(
+            f"{name:<16}{len(objects):>10}{total / len(objects):>15.1f}"
+            f"{instance_size(objects[0]):>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import argparse
+import gc
+import json
+import platform
+import random
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from importlib import metadata
+from typing import Any
+
+from benchmarks.generator import generate_n_contracts
+from saasy.models import (
+    ArrEventStream,
+    ArrIntervalTimeline,
+    Contract,
+    ContractEventStream,
+)
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+LOOKUPS_PER_CUSTOMER = 100
+
+
+def group_by_customer(contracts: list[Contract]) -> list[list[Contract]]:
+    customers: dict[str, list[Contract]] = {}
+    for contract in contracts:
+        customers.setdefault(contract.customer_id, []).append(contract)
+    return list(customers.values())
+
+
+def run_stages(customers: list[list[Contract]], seed: int) -> dict[str, Any]:
+    # Each stage consumes the previous stage's output so that they can be timed
+    # and measured separately
+    rng = random.Random(seed)
+    ce_streams = [ContractEventStream(c) for c in customers]
+    ae_streams = [ArrEventStream(s) for s in ce_streams]
+    timelines = [ArrIntervalTimeline(s) for s in ae_streams]
+    lookup_dates = [
+        [
+            c[0].start_date + timedelta(days=rng.randrange(-30, 3650))
+            for _ in range(LOOKUPS_PER_CUSTOMER)
+        ]
+        for c in customers
+    ]
+
+    def lookups() -> list[Any]:
+        return [[t[d] for d in ds] for t, ds in zip(timelines, lookup_dates)]
+
+    def batch_lookups() -> list[Any]:
+        return [t.arr_at(ds) for t, ds in zip(timelines, lookup_dates)]
+
+    stages: dict[str, tuple[Callable[[], Any], int]] = {
+        "contract_event_stream": (
+            lambda: [ContractEventStream(c) for c in customers],
+            sum(len(s) for s in ce_streams),
+        ),
+        "arr_event_stream": (
+            lambda: [ArrEventStream(s) for s in ce_streams],
+            sum(len(s) for s in ce_streams),
+        ),
+        "arr_interval_timeline": (
+            lambda: [ArrIntervalTimeline(s) for s in ae_streams],
+            sum(len(t) for t in timelines),
+        ),
+        "lookup": (lookups, len(customers) * LOOKUPS_PER_CUSTOMER),
+        "batch_lookup": (batch_lookups, len(customers) * LOOKUPS_PER_CUSTOMER),
+    }
+    results = {}
+    for name, (stage, items) in stages.items():
+        seconds = time_stage(stage)
+        results[name] = {
+            "seconds": seconds,
+            "items": items,
+            "items_per_second": items / seconds if seconds else None,
+            "peak_bytes": peak_memory(stage),
+        }
+    return results
+
+
+def time_stage(stage: Callable[[], Any]) -> float:
+    gc.collect()
+    start = time.perf_counter()
+    stage()
+    return time.perf_counter() - start
+
+
+def peak_memory(stage: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        stage()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def saasy_version() -> str:
+    try:
+        return metadata.version("saasy")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time each ARR pipeline stage")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="numbers of contracts to benchmark, e.g. 1000 10000 10000000",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default=None, help="name for this run")
+    parser.add_argument("-o", "--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    runs = []
+    for size in args.sizes:
+        contracts = generate_n_contracts(size, seed=args.seed)
+        customers = group_by_customer(contracts)
+        stages = run_stages(customers, args.seed)
+        runs.append(
+            {"contracts": len(contracts), "customers": len(customers), "stages": stages}
+        )
+        print(f"{len(contracts):>10} contracts, {len(customers)} customers")
+        for name, result in stages.items():
+            print(
+                f"    {name:<24}{result['seconds']:>10.3f}s"
+                f"{result['items_per_second'] or 0:>14,.0f}/s"
+                f"{result['peak_bytes'] / 2**20:>10.1f} MiB peak"
+            )
+
+    if args.output:
+        report = {
+            "label": args.label,
+            "saasy_version": saasy_version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "seed": args.seed,
+            "runs": runs,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+
+from saasy.models import (
+    ARR_EVENT_CODES,
+    ARR_EVENT_DTYPE,
+    ARR_EVENT_TYPES,
+    ArrEventStream,
+    ArrEventType,
+    to_datetime64,
+)
+
+PERIOD_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+
+
+@dataclass(frozen=True, slots=True)
+class ArrBridge:
+    periods: np.ndarray
+    opening_arr: np.ndarray
+    closing_arr: np.ndarray
+    totals: dict[ArrEventType, np.ndarray]
+    counts: dict[ArrEventType, np.ndarray]
+
+
+def arr_bridge(
+    arr_event_streams: Iterable[ArrEventStream],
+    period: str = "month",
+    start: date | None = None,
+    end: date | None = None,
+) -> ArrBridge:
+    arrays = [s.to_array() for s in arr_event_streams]
+    events = np.concatenate(arrays) if arrays else np.empty(0, ARR_EVENT_DTYPE)
+    return arr_bridge_from_array(events, period, start, end)
+
+
+def arr_bridge_from_array(
+    events: np.ndarray,
+    period: str = "month",
+    start: date | None = None,
+    end: date | None = None,
+) -> ArrBridge:
+    period_index = to_period_index(events["ordinal"], period)
+    if start is not None:
+        first = int(to_period_index(np.array([start.toordinal()]), period)[0])
+    else:
+        first = int(period_index.min()) if len(events) else 0
+    if end is not None:
+        last = int(to_period_index(np.array([end.toordinal()]), period)[0])
+    else:
+        last = int(period_index.max()) if len(events) else first - 1
+    if start is None and not len(events):
+        # Without events the bridge only has periods from a given start
+        last = first - 1
+    period_count = max(last - first + 1, 0)
+
+    # Events before the first period only contribute to its opening arr
+    arr_change = events["arr_change"]
+    opening = float(arr_change[period_index < first].sum())
+    in_range = (period_index >= first) & (period_index <= last)
+
+    type_count = len(ARR_EVENT_TYPES)
+    keys = (period_index[in_range] - first) * type_count
+    keys += events["event_type"][in_range]
+    size = period_count * type_count
+    weights = arr_change[in_range]
+    totals = np.bincount(keys, weights, size).reshape(period_count, type_count)
+    counts = np.bincount(keys, minlength=size).reshape(period_count, type_count)
+
+    closing_arr = opening + np.cumsum(totals.sum(axis=1))
+    opening_arr = closing_arr - totals.sum(axis=1)
+    return ArrBridge(
+        periods=period_starts(np.arange(first, last + 1), period),
+        opening_arr=opening_arr,
+        closing_arr=closing_arr,
+        totals={t: totals[:, ARR_EVENT_CODES[t]] for t in ARR_EVENT_TYPES},
+        counts={t: counts[:, ARR_EVENT_CODES[t]] for t in ARR_EVENT_TYPES},
+    )
+
+
+def to_period_index(ordinals: np.ndarray, period: str) -> np.ndarray:
+    months = to_datetime64(ordinals).astype("datetime64[M]").astype(np.int64)
+    return months // _period_months(period)
+
+
+def period_starts(period_index: np.ndarray, period: str) -> np.ndarray:
+    months = np.asarray(period_index, dtype=np.int64) * _period_months(period)
+    return months.astype("datetime64[M]").astype("datetime64[D]")
+
+
+def _period_months(period: str) -> int:
+    try:
+        return PERIOD_MONTHS[period]
+    except KeyError:
+        raise ValueError(f"Unsupported period: {period}") from None
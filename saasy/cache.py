@@ -0,0 +1,282 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from functools import partial
+from time import perf_counter
+
+import numpy as np
+
+from saasy.instrumentation import PipelineStats
+from saasy.models import (
+    ArrEventStream,
+    ArrIntervalTimeline,
+    Contract,
+    ContractEventStream,
+    Customer,
+    CustomerDiagnostic,
+    SaasData,
+)
+
+# Part of every key, so bumping it invalidates entries written by older versions
+CACHE_VERSION = 1
+
+_KEY_DTYPE = np.dtype([("start", np.int32), ("end", np.int32), ("tcv", np.float64)])
+
+CACHED_ARR_EVENT_DTYPE = np.dtype(
+    [
+        ("contract_event", np.int32),
+        ("event_type", np.int8),
+        ("arr_change", np.float64),
+    ]
+)
+
+_SEGMENT_PREFIX = "segment-"
+# Segments merged into one once a store would leave more than this many
+DEFAULT_MAX_SEGMENTS = 16
+_SEGMENT_FILES = (
+    "keys",
+    "event_offsets",
+    "events",
+    "interval_offsets",
+    "intervals",
+)
+
+
+def customer_key(customer: Customer) -> str:
+    # Contract order is part of the key as ties between contract events are
+    # processed in contract order
+    contracts = np.array(
+        [
+            (c.start_date.toordinal(), c.end_date.toordinal(), c.tcv)
+            for c in customer.contracts
+        ],
+        dtype=_KEY_DTYPE,
+    )
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{CACHE_VERSION}:{customer.id}:".encode())
+    digest.update(contracts.tobytes())
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True, slots=True)
+class _Segment:
+    path: str
+    # Offsets are lists as indexing memory mapped arrays per customer is slow
+    event_offsets: list[int]
+    events: np.ndarray
+    interval_offsets: list[int]
+    intervals: np.ndarray
+
+    def entry(self, row: int) -> tuple[np.ndarray, np.ndarray]:
+        events = self.events[self.event_offsets[row] : self.event_offsets[row + 1]]
+        intervals = self.intervals[
+            self.interval_offsets[row] : self.interval_offsets[row + 1]
+        ]
+        return events, intervals
+
+
+class ArrCache:
+    # Computed arr events and intervals stored on disk by customer_key. Each
+    # store writes a segment directory of .npy columns holding many customers,
+    # which are memory mapped when the cache is opened. Segments are merged
+    # once there are more than max_segments of them.
+
+    __slots__ = ("max_segments", "__directory", "__segments", "__entries")
+
+    def __init__(
+        self, directory: str | os.PathLike, max_segments: int = DEFAULT_MAX_SEGMENTS
+    ) -> None:
+        if max_segments < 1:
+            raise ValueError("max_segments must be at least 1")
+        self.max_segments = max_segments
+        self.__directory = os.fspath(directory)
+        os.makedirs(self.__directory, exist_ok=True)
+        self.__segments: list[_Segment] = []
+        # Segment index and row by key
+        self.__entries: dict[str, tuple[int, int]] = {}
+        for name in sorted(os.listdir(self.__directory)):
+            if name.startswith(_SEGMENT_PREFIX):
+                self.__open_segment(os.path.join(self.__directory, name))
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__entries
+
+    def __iter__(self) -> Iterator[str]:
+        return self.__entries.__iter__()
+
+    def __len__(self) -> int:
+        return self.__entries.__len__()
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.__segments)
+
+    def get(self, key: str) -> tuple[np.ndarray, np.ndarray] | None:
+        # (CACHED_ARR_EVENT_DTYPE events, ARR_INTERVAL_DTYPE intervals)
+        entry = self.__entries.get(key)
+        if entry is None:
+            return None
+        segment, row = entry
+        return self.__segments[segment].entry(row)
+
+    def load(self, customer: Customer, key: str | None = None) -> bool:
+        # Sets the customer's arr to be restored from the cache when first used,
+        # returning whether it was found
+        entry = self.get(customer_key(customer) if key is None else key)
+        if entry is None:
+            return False
+        customer.set_arr_loader(partial(restore_arr, customer.contracts, *entry))
+        return True
+
+    def store(self, customers: Iterable[Customer]) -> None:
+        self.__store([(customer_key(c), c) for c in customers])
+
+    def compute(
+        self,
+        saas_data: SaasData,
+        max_workers: int | None = None,
+        chunksize: int | None = None,
+        stats: PipelineStats | None = None,
+    ) -> list[CustomerDiagnostic]:
+        # Only customers whose contracts changed since they were cached are
+        # recomputed, and those are then added to the cache. Like
+        # compute_isolated, customers that fail are reported instead of
+        # stopping the others from being computed and stored.
+        start = perf_counter()
+        keyed = [(customer_key(c), c) for c in saas_data.values() if not c.is_computed]
+        misses = [(key, c) for key, c in keyed if not self.load(c, key)]
+        if stats is not None:
+            loaded = len(keyed) - len(misses)
+            stats.record_stage("cache_load", perf_counter() - start, loaded)
+
+        diagnostics = saas_data.compute_isolated(max_workers, chunksize, stats)
+        failed = {d.customer_id for d in diagnostics}
+        misses = [(key, c) for key, c in misses if c.id not in failed]
+        if not misses:
+            return diagnostics
+        start = perf_counter()
+        self.__store(misses)
+        if stats is not None:
+            stats.record_stage("cache_store", perf_counter() - start, len(misses))
+        return diagnostics
+
+    def compact(self, keys: Iterable[str] | None = None) -> None:
+        # Rewrites the entries for keys, or every entry, into a single segment
+        # and deletes the others. Passing the keys of current customers drops
+        # entries for contracts that have since changed.
+        entries = self.__entries
+        kept = [
+            k for k in dict.fromkeys(entries if keys is None else keys) if k in entries
+        ]
+        if len(self.__segments) == 1 and len(kept) == len(entries):
+            return
+        paths = [segment.path for segment in self.__segments]
+        path = None
+        if kept:
+            events = []
+            intervals = []
+            for key in kept:
+                segment, row = entries[key]
+                key_events, key_intervals = self.__segments[segment].entry(row)
+                events.append(key_events)
+                intervals.append(key_intervals)
+            path = self.__write_segment(kept, events, intervals)
+        self.__segments = []
+        self.__entries = {}
+        for old_path in paths:
+            if old_path != path:
+                shutil.rmtree(old_path, ignore_errors=True)
+        if path is not None:
+            self.__open_segment(path)
+
+    def __store(self, keyed: list[tuple[str, Customer]]) -> None:
+        keyed = [(key, c) for key, c in keyed if key not in self.__entries]
+        if not keyed:
+            return
+        events = []
+        intervals = []
+        for _, customer in keyed:
+            events.append(arr_event_columns(customer.arr_events))
+            intervals.append(customer.arr_timeline.to_array())
+        path = self.__write_segment([key for key, _ in keyed], events, intervals)
+        self.__open_segment(path)
+        if len(self.__segments) > self.max_segments:
+            self.compact()
+
+    def __write_segment(
+        self, keys: list[str], events: list[np.ndarray], intervals: list[np.ndarray]
+    ) -> str:
+        keys_array = np.array(keys, dtype="S32")
+        columns = {
+            "keys": keys_array,
+            "event_offsets": _offsets(events),
+            "events": np.concatenate(events),
+            "interval_offsets": _offsets(intervals),
+            "intervals": np.concatenate(intervals),
+        }
+        # Segments are named by their keys, so an identical segment written
+        # concurrently is simply discarded
+        name = (
+            _SEGMENT_PREFIX
+            + hashlib.blake2b(keys_array.tobytes(), digest_size=16).hexdigest()
+        )
+        path = os.path.join(self.__directory, name)
+        temp_path = tempfile.mkdtemp(prefix=".", dir=self.__directory)
+        for column, values in columns.items():
+            np.save(os.path.join(temp_path, f"{column}.npy"), values)
+        try:
+            os.rename(temp_path, path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+            shutil.rmtree(temp_path)
+        return path
+
+    def __open_segment(self, path: str) -> None:
+        # asarray drops the memmap subclass, which adds overhead to every slice
+        keys, event_offsets, events, interval_offsets, intervals = (
+            np.asarray(np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r"))
+            for column in _SEGMENT_FILES
+        )
+        index = len(self.__segments)
+        self.__segments.append(
+            _Segment(
+                path,
+                event_offsets.tolist(),
+                events,
+                interval_offsets.tolist(),
+                intervals,
+            )
+        )
+        for row, key in enumerate(keys.tolist()):
+            self.__entries[key.decode()] = (index, row)
+
+
+def arr_event_columns(arr_events: ArrEventStream) -> np.ndarray:
+    arr_events_array = arr_events.to_array()
+    events = np.empty(len(arr_events), dtype=CACHED_ARR_EVENT_DTYPE)
+    events["contract_event"] = arr_events.contract_event_indices()
+    events["event_type"] = arr_events_array["event_type"]
+    events["arr_change"] = arr_events_array["arr_change"]
+    return events
+
+
+def restore_arr(
+    contracts: Sequence[Contract], events: np.ndarray, intervals: np.ndarray
+) -> tuple[ArrEventStream, ArrIntervalTimeline]:
+    arr_events = ArrEventStream.from_columns(
+        ContractEventStream(contracts),
+        events["contract_event"],
+        events["event_type"],
+        events["arr_change"],
+    )
+    return arr_events, ArrIntervalTimeline.from_array(intervals)
+
+
+def _offsets(arrays: list[np.ndarray]) -> np.ndarray:
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum([len(a) for a in arrays], out=offsets[1:])
+    return offsets
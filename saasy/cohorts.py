@@ -0,0 +1,148 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+
+from saasy.bridge import period_starts, to_period_index
+from saasy.models import ARR_EVENT_CODES, ARR_EVENT_DTYPE, ArrEventStream, ArrEventType
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+_NO_COHORT = np.iinfo(np.int64).max
+
+
+@dataclass(frozen=True, slots=True)
+class CohortAnalysis:
+    # Cohorts are the periods of each customer's first New arr event. The
+    # cohort x period matrices hold values at the end of each period and
+    # starting arr is the cohort's arr at the end of its own period.
+    cohorts: np.ndarray
+    periods: np.ndarray
+    customer_counts: np.ndarray
+    starting_arr: np.ndarray
+    arr: np.ndarray
+    retained_arr: np.ndarray
+    nrr: np.ndarray
+    grr: np.ndarray
+
+
+def cohort_analysis(
+    arr_event_streams: Iterable[ArrEventStream],
+    period: str = "month",
+    end: date | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> CohortAnalysis:
+    arrays = [s.to_array() for s in arr_event_streams]
+    counts = np.array([len(a) for a in arrays], dtype=np.int64)
+    events = np.concatenate(arrays) if arrays else np.empty(0, ARR_EVENT_DTYPE)
+    customers = np.repeat(np.arange(len(arrays), dtype=np.int64), counts)
+    return cohort_analysis_from_array(
+        events, customers, len(arrays), period, end, chunk_size
+    )
+
+
+def cohort_analysis_from_array(
+    events: np.ndarray,
+    customers: np.ndarray,
+    customer_count: int,
+    period: str = "month",
+    end: date | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> CohortAnalysis:
+    if np.any(customers[1:] < customers[:-1]):
+        order = np.argsort(customers, kind="stable")
+        events, customers = events[order], customers[order]
+    period_index = to_period_index(events["ordinal"], period)
+
+    is_new = events["event_type"] == ARR_EVENT_CODES[ArrEventType.New]
+    customer_cohorts = np.full(customer_count, _NO_COHORT, dtype=np.int64)
+    np.minimum.at(customer_cohorts, customers[is_new], period_index[is_new])
+    if end is not None:
+        last = int(to_period_index(np.array([end.toordinal()]), period)[0])
+        customer_cohorts[customer_cohorts > last] = _NO_COHORT
+    has_cohort = customer_cohorts != _NO_COHORT
+    cohorts, cohort_rows = np.unique(customer_cohorts[has_cohort], return_inverse=True)
+    customer_rows = np.full(customer_count, -1, dtype=np.int64)
+    customer_rows[has_cohort] = cohort_rows
+
+    first = int(cohorts[0]) if len(cohorts) else 0
+    if end is None:
+        last = int(period_index.max()) if len(cohorts) else first - 1
+    period_count = max(last - first + 1, 0)
+
+    arr = np.zeros((len(cohorts), period_count))
+    retained_arr = np.zeros((len(cohorts), period_count))
+    starting_arr = np.zeros(len(cohorts))
+    event_bounds = np.searchsorted(customers, np.arange(customer_count + 1))
+    for chunk_start in range(0, customer_count, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, customer_count)
+        lo, hi = event_bounds[chunk_start], event_bounds[chunk_end]
+        _add_chunk(
+            customers[lo:hi] - chunk_start,
+            period_index[lo:hi] - first,
+            events["arr_change"][lo:hi],
+            customer_cohorts[chunk_start:chunk_end] - first,
+            customer_rows[chunk_start:chunk_end],
+            period_count,
+            arr,
+            retained_arr,
+            starting_arr,
+        )
+
+    # Ratios are undefined for periods before a cohort starts
+    before_cohort = np.arange(period_count) < (cohorts - first)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        nrr = np.where(before_cohort, np.nan, arr / starting_arr[:, None])
+        grr = np.where(before_cohort, np.nan, retained_arr / starting_arr[:, None])
+    return CohortAnalysis(
+        cohorts=period_starts(cohorts, period),
+        periods=period_starts(np.arange(first, last + 1), period),
+        customer_counts=np.bincount(cohort_rows, minlength=len(cohorts)),
+        starting_arr=starting_arr,
+        arr=arr,
+        retained_arr=retained_arr,
+        nrr=nrr,
+        grr=grr,
+    )
+
+
+def _add_chunk(
+    customers: np.ndarray,
+    columns: np.ndarray,
+    arr_changes: np.ndarray,
+    cohort_columns: np.ndarray,
+    cohort_rows: np.ndarray,
+    period_count: int,
+    arr: np.ndarray,
+    retained_arr: np.ndarray,
+    starting_arr: np.ndarray,
+) -> None:
+    has_cohort = cohort_rows >= 0
+    customer_count = len(cohort_rows)
+
+    # Customer x period arr at the end of each period. Changes after the last
+    # period land in an extra column that is dropped.
+    width = period_count + 1
+    keep = has_cohort[customers]
+    keys = customers[keep] * width + np.minimum(columns[keep], period_count)
+    changes = np.bincount(
+        keys, weights=arr_changes[keep], minlength=customer_count * width
+    )
+    customer_arr = np.cumsum(changes.reshape(customer_count, width)[:, :-1], axis=1)
+    customer_arr = customer_arr[has_cohort]
+    cohort_columns = cohort_columns[has_cohort]
+    cohort_rows = cohort_rows[has_cohort]
+    if not len(cohort_rows) or not period_count:
+        return
+
+    # Gross retention caps each customer at their starting arr
+    starting = customer_arr[np.arange(len(customer_arr)), cohort_columns]
+    retained = np.minimum(customer_arr, starting[:, None])
+    retained[np.arange(period_count) < cohort_columns[:, None]] = 0
+
+    order = np.argsort(cohort_rows, kind="stable")
+    rows, bounds = np.unique(cohort_rows[order], return_index=True)
+    arr[rows] += np.add.reduceat(customer_arr[order], bounds, axis=0)
+    retained_arr[rows] += np.add.reduceat(retained[order], bounds, axis=0)
+    starting_arr[rows] += np.add.reduceat(starting[order], bounds)
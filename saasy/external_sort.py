@@ -0,0 +1,196 @@
+import heapq
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable, Iterator
+from datetime import date
+from itertools import groupby
+from operator import itemgetter
+from typing import Self
+
+import numpy as np
+
+from saasy.models import (
+    CONTRACT_EVENT_CODES,
+    CONTRACT_EVENT_TYPES,
+    ArrEventStream,
+    ArrInterval,
+    ArrIntervalTimeline,
+    Contract,
+    ContractEvent,
+    ContractEventType,
+    ContractTable,
+)
+
+DEFAULT_RUN_SIZE = 1_000_000
+
+# Records sort by customer, then in ContractEventStream order: ordinal, end
+# before start and finally the order contracts were added in. Each record
+# carries its contract so events can be rebuilt without holding contracts.
+SORT_RECORD_DTYPE = np.dtype(
+    [
+        ("customer", np.int32),
+        ("ordinal", np.int32),
+        ("event_type", np.int8),
+        ("contract", np.int64),
+        ("start_ordinal", np.int32),
+        ("end_ordinal", np.int32),
+        ("tcv", np.float64),
+    ]
+)
+
+_SORT_FIELDS = ("contract", "event_type", "ordinal", "customer")
+
+# Records read from a spilled run at a time
+_READ_BLOCK_SIZE = 65_536
+
+
+class ExternalContractEventSort:
+    # Sorts contract events for every customer when they do not fit in memory.
+    # Added contracts are buffered and once at least run_size events are
+    # buffered they are sorted and spilled to a temporary file. Spilled runs
+    # are k-way merged when iterated.
+
+    __slots__ = (
+        "run_size",
+        "__directory",
+        "__runs",
+        "__buffer",
+        "__buffered",
+        "__customer_ids",
+        "__customer_codes",
+        "__contract_count",
+    )
+
+    def __init__(
+        self, run_size: int = DEFAULT_RUN_SIZE, directory: str | None = None
+    ) -> None:
+        if run_size < 1:
+            raise ValueError("run_size must be at least 1")
+        self.run_size = run_size
+        self.__directory = tempfile.mkdtemp(prefix="saasy-sort-", dir=directory)
+        self.__runs: list[str] = []
+        self.__buffer: list[np.ndarray] = []
+        self.__buffered = 0
+        self.__customer_ids: list[str] = []
+        self.__customer_codes: dict[str, int] = {}
+        self.__contract_count = 0
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        shutil.rmtree(self.__directory, ignore_errors=True)
+        self.__runs = []
+        self.__buffer = []
+        self.__buffered = 0
+
+    @property
+    def run_count(self) -> int:
+        return len(self.__runs)
+
+    def add_contracts(self, contracts: Iterable[Contract]) -> None:
+        table = ContractTable.from_contracts(contracts)
+        if not len(table):
+            return
+        codes = self.__customer_codes
+        for id in table.customer_ids:
+            if id not in codes:
+                codes[id] = len(self.__customer_ids)
+                self.__customer_ids.append(id)
+        customers = np.array([codes[id] for id in table.customer_ids], np.int32)
+
+        # Start and end records for each contract
+        records = np.empty(2 * len(table), dtype=SORT_RECORD_DTYPE)
+        contracts_index = np.arange(len(table)) + self.__contract_count
+        for name, values in (
+            ("customer", customers[table.customer_codes]),
+            ("contract", contracts_index),
+            ("start_ordinal", table.start_ordinals),
+            ("end_ordinal", table.end_ordinals),
+            ("tcv", table.tcv),
+        ):
+            records[name] = np.repeat(values, 2)
+        records["ordinal"][0::2] = table.start_ordinals
+        records["ordinal"][1::2] = table.end_ordinals
+        records["event_type"][0::2] = CONTRACT_EVENT_CODES[ContractEventType.Start]
+        records["event_type"][1::2] = CONTRACT_EVENT_CODES[ContractEventType.End]
+        self.__contract_count += len(table)
+
+        self.__buffer.append(records)
+        self.__buffered += len(records)
+        if self.__buffered >= self.run_size:
+            self.__spill()
+
+    def __sorted_buffer(self) -> np.ndarray:
+        if not self.__buffer:
+            return np.empty(0, dtype=SORT_RECORD_DTYPE)
+        records = np.concatenate(self.__buffer)
+        return records[np.lexsort([records[name] for name in _SORT_FIELDS])]
+
+    def __spill(self) -> None:
+        records = self.__sorted_buffer()
+        self.__buffer = []
+        self.__buffered = 0
+        path = os.path.join(self.__directory, f"run-{len(self.__runs):06d}.bin")
+        records.tofile(path)
+        self.__runs.append(path)
+
+    def __iter__(self) -> Iterator[tuple]:
+        # Merged records as tuples in SORT_RECORD_DTYPE field order. Contracts
+        # still buffered are merged in memory without being spilled.
+        runs = [_read_run(path) for path in self.__runs]
+        runs.append(iter(self.__sorted_buffer().tolist()))
+        return heapq.merge(*runs)
+
+    def iter_customer_events(self) -> Iterator[tuple[str, Iterator[ContractEvent]]]:
+        # Contract events for one customer at a time, in ContractEventStream
+        # order. Each customer's events must be consumed before the next.
+        for code, records in groupby(self, key=itemgetter(0)):
+            yield self.__customer_ids[code], _contract_events(
+                self.__customer_ids[code], records
+            )
+
+    def iter_customer_arr(
+        self,
+    ) -> Iterator[tuple[str, ArrEventStream, ArrIntervalTimeline]]:
+        for customer_id, contract_events in self.iter_customer_events():
+            arr_events = ArrEventStream(contract_events)
+            yield customer_id, arr_events, ArrIntervalTimeline(arr_events)
+
+    def iter_customer_intervals(self) -> Iterator[tuple[str, Iterator[ArrInterval]]]:
+        # Streams each customer's intervals without holding its arr events. Each
+        # customer's intervals must be consumed before the next.
+        for customer_id, contract_events in self.iter_customer_events():
+            arr_events = ArrEventStream.iter_events(contract_events)
+            yield customer_id, ArrIntervalTimeline.iter_intervals(arr_events)
+
+
+def _read_run(path: str) -> Iterator[tuple]:
+    with open(path, "rb") as f:
+        while True:
+            block: np.ndarray = np.fromfile(
+                f, dtype=SORT_RECORD_DTYPE, count=_READ_BLOCK_SIZE
+            )
+            if not len(block):
+                return
+            yield from block.tolist()
+
+
+def _contract_events(
+    customer_id: str, records: Iterable[tuple]
+) -> Iterator[ContractEvent]:
+    # Start and end events of a contract share one Contract, which is only held
+    # until its second event. That is usually the end event, but for contracts
+    # starting on their end date the end event sorts first.
+    contracts: dict[int, Contract] = {}
+    for _, _, event_type, index, start, end, tcv in records:
+        contract = contracts.pop(index, None)
+        if contract is None:
+            contract = contracts[index] = Contract(
+                customer_id, date.fromordinal(start), date.fromordinal(end), tcv
+            )
+        yield ContractEvent(contract, CONTRACT_EVENT_TYPES[event_type])
@@ -0,0 +1,101 @@
+import heapq
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any, Self
+
+# Called with (stage name, seconds, items processed) whenever a stage finishes
+StageCallback = Callable[[str, float, int], None]
+
+
+@dataclass(slots=True)
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0
+    items: int = 0
+
+
+class PipelineStats:
+    # Instrumentation is opt-in: pipeline code only records into a stats object
+    # when one is passed in, so the disabled cost is a single None check.
+
+    __slots__ = (
+        "stages",
+        "arr_events",
+        "branches",
+        "slowest_count",
+        "__slowest",
+        "__callbacks",
+    )
+
+    def __init__(self, slowest_count: int = 10) -> None:
+        self.stages: dict[str, StageStats] = {}
+        # Emitted arr events by ArrEventType
+        self.arr_events: Counter[Any] = Counter()
+        # ArrEventStream state machine branches taken
+        self.branches: Counter[str] = Counter()
+        self.slowest_count = slowest_count
+        # Min-heap of (seconds, customer id) for the slowest customers
+        self.__slowest: list[tuple[float, str]] = []
+        self.__callbacks: list[StageCallback] = []
+
+    def add_callback(self, callback: StageCallback) -> None:
+        self.__callbacks.append(callback)
+
+    def record_stage(self, name: str, seconds: float, items: int = 0) -> None:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageStats()
+        stage.calls += 1
+        stage.seconds += seconds
+        stage.items += items
+        for callback in self.__callbacks:
+            callback(name, seconds, items)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        # Items processed can be set on the yielded StageStats
+        current = StageStats()
+        start = perf_counter()
+        yield current
+        self.record_stage(name, perf_counter() - start, current.items)
+
+    def record_customer(self, customer_id: str, seconds: float) -> None:
+        entry = (seconds, customer_id)
+        if len(self.__slowest) < self.slowest_count:
+            heapq.heappush(self.__slowest, entry)
+        elif entry > self.__slowest[0]:
+            heapq.heapreplace(self.__slowest, entry)
+
+    def slowest_customers(self) -> list[tuple[str, float]]:
+        return [(id, seconds) for seconds, id in sorted(self.__slowest, reverse=True)]
+
+    def merge(self, other: Self) -> None:
+        # Stages recorded elsewhere, such as in worker processes, are reported
+        # to this object's callbacks once merged
+        for name, stage in other.stages.items():
+            merged = self.stages.setdefault(name, StageStats())
+            merged.calls += stage.calls
+            merged.seconds += stage.seconds
+            merged.items += stage.items
+            for callback in self.__callbacks:
+                callback(name, stage.seconds, stage.items)
+        self.arr_events.update(other.arr_events)
+        self.branches.update(other.branches)
+        for id, seconds in other.slowest_customers():
+            self.record_customer(id, seconds)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "stages": {
+                name: {"calls": s.calls, "seconds": s.seconds, "items": s.items}
+                for name, s in self.stages.items()
+            },
+            "arr_events": {
+                getattr(t, "name", str(t)): n for t, n in self.arr_events.items()
+            },
+            "branches": dict(self.branches),
+            "slowest_customers": self.slowest_customers(),
+        }
@@ -0,0 +1,77 @@
+import csv
+import json
+import os
+from collections.abc import Iterable, Iterator, Mapping
+from datetime import date
+from itertools import islice
+from typing import Any
+
+from saasy.models import Contract, SaasData
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+CONTRACT_FIELDS = ("customer_id", "start_date", "end_date", "tcv")
+
+
+def iter_contract_batches(
+    path: str | os.PathLike, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[list[Contract]]:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return iter_csv_contracts(path, chunk_size)
+    if extension in (".jsonl", ".ndjson"):
+        return iter_jsonl_contracts(path, chunk_size)
+    raise ValueError(f"Unsupported contract export format: {extension}")
+
+
+def iter_csv_contracts(
+    path: str | os.PathLike, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[list[Contract]]:
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        missing = set(CONTRACT_FIELDS) - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"Contract export is missing columns: {sorted(missing)}")
+        yield from _chunked(map(_parse_contract, reader), chunk_size)
+
+
+def iter_jsonl_contracts(
+    path: str | os.PathLike, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[list[Contract]]:
+    with open(path) as f:
+        records = (json.loads(line) for line in f if line.strip())
+        yield from _chunked(map(_parse_contract, records), chunk_size)
+
+
+def load_saas_data(
+    path: str | os.PathLike,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    saas_data: SaasData | None = None,
+) -> SaasData:
+    if saas_data is None:
+        saas_data = SaasData()
+    for batch in iter_contract_batches(path, chunk_size):
+        saas_data.add_contracts(batch)
+    return saas_data
+
+
+def _chunked(
+    contracts: Iterable[Contract], chunk_size: int
+) -> Iterator[list[Contract]]:
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    iterator = iter(contracts)
+    while batch := list(islice(iterator, chunk_size)):
+        yield batch
+
+
+def _parse_contract(record: Mapping[str, Any]) -> Contract:
+    try:
+        return Contract(
+            str(record["customer_id"]),
+            date.fromisoformat(record["start_date"]),
+            date.fromisoformat(record["end_date"]),
+            float(record["tcv"]),
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid contract record: {record}") from e
@@ -1,33 +1,197 @@
-from collections.abc import Iterable, Sequence
-from dataclasses import dataclass
-from datetime import date, timedelta
+import heapq
+import math
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
 from enum import Enum, auto
-from functools import total_ordering
-from typing import Self, Iterator
+from functools import partial, total_ordering
+from operator import attrgetter
+from time import perf_counter
+from typing import Any, Self, overload
 
+import numpy as np
 import portion as P
-from dateutil.utils import within_delta
 
-# TODO: update all classes to use __slots__
+from saasy.instrumentation import PipelineStats
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Contract:
     customer_id: str
     start_date: date
     end_date: date
     tcv: float
+    acv: float = field(init=False, repr=False, compare=False)
 
     def __post_init__(self) -> None:
-        pass
-        # Initialize tcv or acv fields
+        len_years = self.len_years()
+        acv = self.tcv / len_years if len_years else math.inf
+        object.__setattr__(self, "acv", acv)
 
     def len_years(self) -> float:
         return yearfrac(self.start_date, self.end_date)
 
+
+class ContractError(Enum):
+    EndBeforeStart = auto()
+    NonPositiveTcv = auto()
+    ZeroLength = auto()
+
+
+class ContractTable(Sequence[Contract]):
+
+    __slots__ = (
+        "__customer_ids",
+        "__customer_codes",
+        "__start_ordinals",
+        "__end_ordinals",
+        "__tcv",
+        "__len_years",
+        "__acv",
+    )
+
+    def __init__(
+        self,
+        customer_ids: Sequence[str],
+        customer_codes: np.ndarray,
+        start_ordinals: np.ndarray,
+        end_ordinals: np.ndarray,
+        tcv: np.ndarray,
+    ) -> None:
+        self.__customer_ids: list[str] = list(customer_ids)
+        self.__customer_codes = np.asarray(customer_codes, dtype=np.int32)
+        self.__start_ordinals = np.asarray(start_ordinals, dtype=np.int32)
+        self.__end_ordinals = np.asarray(end_ordinals, dtype=np.int32)
+        self.__tcv = np.asarray(tcv, dtype=np.float64)
+        lengths = {
+            len(self.__customer_codes),
+            len(self.__start_ordinals),
+            len(self.__end_ordinals),
+            len(self.__tcv),
+        }
+        if len(lengths) > 1:
+            raise ValueError("ContractTable columns must all have the same length")
+        self.__len_years = _yearfrac_ordinals(
+            self.__start_ordinals, self.__end_ordinals
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.__acv = self.__tcv / self.__len_years
+
+    @classmethod
+    def from_contracts(cls, contracts: Iterable[Contract]) -> Self:
+        contracts = list(contracts)
+        return cls.from_columns(
+            [c.customer_id for c in contracts],
+            [c.start_date for c in contracts],
+            [c.end_date for c in contracts],
+            [c.tcv for c in contracts],
+        )
+
+    @classmethod
+    def from_columns(
+        cls,
+        customer_ids: Iterable[str],
+        start_dates: Iterable[date] | np.ndarray,
+        end_dates: Iterable[date] | np.ndarray,
+        tcv: Iterable[float] | np.ndarray,
+    ) -> Self:
+        codes: dict[str, int] = {}
+        customer_codes = [codes.setdefault(id, len(codes)) for id in customer_ids]
+        return cls(
+            list(codes),
+            np.array(customer_codes, dtype=np.int32),
+            _to_ordinals(start_dates),
+            _to_ordinals(end_dates),
+            np.asarray(tcv, dtype=np.float64),
+        )
+
+    def to_contracts(self) -> list[Contract]:
+        customer_ids = self.__customer_ids
+        return [
+            Contract(
+                customer_ids[code],
+                date.fromordinal(start),
+                date.fromordinal(end),
+                tcv,
+            )
+            for code, start, end, tcv in zip(
+                self.__customer_codes.tolist(),
+                self.__start_ordinals.tolist(),
+                self.__end_ordinals.tolist(),
+                self.__tcv.tolist(),
+            )
+        ]
+
+    @overload
+    def __getitem__(self, index: int) -> Contract:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Contract]:
+        ...
+
+    def __getitem__(self, index: int | slice) -> Contract | list[Contract]:
+        if isinstance(index, slice):
+            return ContractTable(
+                self.__customer_ids,
+                self.__customer_codes[index],
+                self.__start_ordinals[index],
+                self.__end_ordinals[index],
+                self.__tcv[index],
+            ).to_contracts()
+        return Contract(
+            self.__customer_ids[self.__customer_codes[index]],
+            date.fromordinal(int(self.__start_ordinals[index])),
+            date.fromordinal(int(self.__end_ordinals[index])),
+            float(self.__tcv[index]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.__tcv)
+
     @property
-    def acv(self) -> float:
-        return self.tcv / self.len_years()
+    def customer_ids(self) -> list[str]:
+        return self.__customer_ids
+
+    @property
+    def customer_codes(self) -> np.ndarray:
+        return self.__customer_codes
+
+    @property
+    def start_ordinals(self) -> np.ndarray:
+        return self.__start_ordinals
+
+    @property
+    def end_ordinals(self) -> np.ndarray:
+        return self.__end_ordinals
+
+    @property
+    def tcv(self) -> np.ndarray:
+        return self.__tcv
+
+    @property
+    def len_years(self) -> np.ndarray:
+        return self.__len_years
+
+    @property
+    def acv(self) -> np.ndarray:
+        return self.__acv
+
+    def validate(self) -> np.ndarray:
+        # ContractError value for each contract that cannot produce arr events,
+        # or 0 for valid contracts
+        errors = np.zeros(len(self), dtype=np.int8)
+        errors[self.__len_years == 0] = ContractError.ZeroLength.value
+        errors[~(self.__tcv > 0)] = ContractError.NonPositiveTcv.value
+        errors[
+            self.__end_ordinals < self.__start_ordinals
+        ] = ContractError.EndBeforeStart.value
+        return errors
 
 
 class ContractEventType(Enum):
@@ -36,16 +200,20 @@ class ContractEventType(Enum):
 
 
 @total_ordering
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ContractEvent:
     contract: Contract
     event_type: ContractEventType
+    event_date: date = field(init=False, repr=False, compare=False)
+    event_ordinal: int = field(init=False, repr=False, compare=False)
 
-    @property
-    def event_date(self) -> date:
+    def __post_init__(self) -> None:
         if self.event_type == ContractEventType.Start:
-            return self.contract.start_date
-        return self.contract.end_date
+            event_date = self.contract.start_date
+        else:
+            event_date = self.contract.end_date
+        object.__setattr__(self, "event_date", event_date)
+        object.__setattr__(self, "event_ordinal", event_date.toordinal())
 
     @property
     def acv(self) -> float:
@@ -60,9 +228,9 @@ class ContractEvent:
     def __lt__(self, other: Self) -> bool:
         if not isinstance(other, self.__class__):
             return NotImplemented
-        if self.event_date < other.event_date:
+        if self.event_ordinal < other.event_ordinal:
             return True
-        if self.event_date > other.event_date:
+        if self.event_ordinal > other.event_ordinal:
             return False
         if self.event_type == other.event_type:
             return False
@@ -72,32 +240,131 @@ class ContractEvent:
     def __lte__(self, other: Self) -> bool:
         if not isinstance(other, self.__class__):
             return NotImplemented
-        if self.event_date < other.event_date:
+        if self.event_ordinal < other.event_ordinal:
             return True
-        if self.event_date > other.event_date:
+        if self.event_ordinal > other.event_ordinal:
             return False
         if self.event_type == other.event_type:
             return True
         return self.event_type == ContractEventType.End
 
 
+# End events are coded lower than start events so that a lexsort on
+# (date, type) emits contract end events before start events on the same day
+CONTRACT_EVENT_TYPES = (ContractEventType.End, ContractEventType.Start)
+CONTRACT_EVENT_CODES = {t: code for code, t in enumerate(CONTRACT_EVENT_TYPES)}
+
+CONTRACT_EVENT_DTYPE = np.dtype(
+    [
+        ("ordinal", np.int32),
+        ("event_type", np.int8),
+        ("contract", np.int64),
+        ("arr_change", np.float64),
+    ]
+)
+
+
+def _contract_event_key(ce: ContractEvent) -> tuple[int, int]:
+    # Total order for merging, as ContractEvent compares neither less nor equal
+    # for different contracts ending or starting on the same day
+    return ce.event_ordinal, CONTRACT_EVENT_CODES[ce.event_type]
+
+
+# Below this many contracts, sorting ContractEvent objects is quicker than
+# building and sorting the packed events
+_PACKED_MIN_CONTRACTS = 64
+
+
 class ContractEventStream(Sequence[ContractEvent]):
-    def __init__(self, contracts: Iterable[Contract]) -> None:
-        self.__contract_events: list[ContractEvent] = []
-        for contract in contracts:
-            self.__contract_events.append(
-                ContractEvent(contract, ContractEventType.Start)
-            )
-            self.__contract_events.append(
-                ContractEvent(contract, ContractEventType.End)
-            )
-        self.__contract_events.sort()
 
+    __slots__ = ("__contracts", "__events", "__contract_events")
+
+    def __init__(self, contracts: Iterable[Contract]) -> None:
+        self.__events: np.ndarray | None = None
+        self.__contract_events: list[ContractEvent] | None = None
+        if isinstance(contracts, ContractTable):
+            self.__contracts: Sequence[Contract] = contracts
+            self.__events = self.__pack(contracts)
+            return
+        contracts = list(contracts)
+        self.__contracts = contracts
+        if len(contracts) < _PACKED_MIN_CONTRACTS:
+            # Typical customers only have a few contracts. The packed events
+            # are then only built if requested.
+            self.__contract_events = _sorted_events(contracts)
+        else:
+            self.__events = self.__pack(ContractTable.from_contracts(contracts))
+
+    @staticmethod
+    def __pack(table: ContractTable) -> np.ndarray:
+        # Start and end events are interleaved per contract so that the stable
+        # sort keeps the same order for ties as sorting ContractEvent objects
+        events = np.empty(2 * len(table), dtype=CONTRACT_EVENT_DTYPE)
+        start = CONTRACT_EVENT_CODES[ContractEventType.Start]
+        end = CONTRACT_EVENT_CODES[ContractEventType.End]
+        events["ordinal"][0::2] = table.start_ordinals
+        events["ordinal"][1::2] = table.end_ordinals
+        events["event_type"][0::2] = start
+        events["event_type"][1::2] = end
+        events["contract"] = np.repeat(np.arange(len(table)), 2)
+        events["arr_change"][0::2] = table.acv
+        events["arr_change"][1::2] = -table.acv
+
+        order = np.lexsort((events["event_type"], events["ordinal"]))
+        return events[order]
+
+    @overload
     def __getitem__(self, index: int) -> ContractEvent:
-        return self.__contract_events.__getitem__(index)
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[ContractEvent]:
+        ...
+
+    def __getitem__(self, index: int | slice) -> ContractEvent | list[ContractEvent]:
+        if self.__contract_events is not None:
+            return self.__contract_events[index]
+        if isinstance(index, slice):
+            return list(self.__create_events(self.events[index]))
+        event = self.events[index]
+        return ContractEvent(
+            self.__contracts[event["contract"]],
+            CONTRACT_EVENT_TYPES[event["event_type"]],
+        )
+
+    def __iter__(self) -> Iterator[ContractEvent]:
+        if self.__contract_events is not None:
+            return iter(self.__contract_events)
+        return self.__create_events(self.events)
+
+    def __create_events(self, events: np.ndarray) -> Iterator[ContractEvent]:
+        contracts = self.__contracts
+        for contract, event_type in zip(
+            events["contract"].tolist(), events["event_type"].tolist()
+        ):
+            yield ContractEvent(contracts[contract], CONTRACT_EVENT_TYPES[event_type])
 
     def __len__(self) -> int:
-        return self.__contract_events.__len__()
+        return 2 * len(self.__contracts)
+
+    @property
+    def contracts(self) -> Sequence[Contract]:
+        return self.__contracts
+
+    @property
+    def events(self) -> np.ndarray:
+        if self.__events is None:
+            self.__events = self.__pack(ContractTable.from_contracts(self.__contracts))
+        return self.__events
+
+
+def _sorted_events(contracts: Iterable[Contract]) -> list[ContractEvent]:
+    # Same order as ContractEventStream, which is quicker for a few contracts
+    return sorted(
+        ContractEvent(contract, event_type)
+        for contract in contracts
+        for event_type in (ContractEventType.Start, ContractEventType.End)
+    )
 
 
 class ArrEventType(Enum):
@@ -108,26 +375,81 @@ class ArrEventType(Enum):
     Renewal = auto()
 
 
-@dataclass
+ARR_EVENT_TYPES = tuple(ArrEventType)
+ARR_EVENT_CODES = {t: code for code, t in enumerate(ARR_EVENT_TYPES)}
+
+ARR_EVENT_DTYPE = np.dtype(
+    [
+        ("ordinal", np.int32),
+        ("event_type", np.int8),
+        ("arr_change", np.float64),
+    ]
+)
+
+
+@dataclass(frozen=True, slots=True)
 class ArrEvent:
     contract_event: ContractEvent
     event_type: ArrEventType
     arr_change: float
+    event_date: date = field(init=False, repr=False, compare=False)
+    event_ordinal: int = field(init=False, repr=False, compare=False)
 
-    @property
-    def event_date(self) -> date:
-        return self.contract_event.event_date
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "event_date", self.contract_event.event_date)
+        object.__setattr__(self, "event_ordinal", self.contract_event.event_ordinal)
 
 
 MAX_RENEWAL_GAP_DAYS = 10
 
 
+class ArrStateError(ValueError):
+    # Raised when a contract event cannot be applied to the ArrEventStream state,
+    # with the state before the event for diagnostics
+    def __init__(
+        self,
+        message: str,
+        contract_event: ContractEvent,
+        curr_arr: float,
+        prev_arr_event: ArrEvent | None,
+    ) -> None:
+        super().__init__(message)
+        self.contract_event = contract_event
+        self.curr_arr = curr_arr
+        self.prev_arr_event = prev_arr_event
+
+
 class ArrEventStream(Sequence[ArrEvent]):
-    def __init__(self, contract_events: ContractEventStream) -> None:
+
+    __slots__ = (
+        "__arr_events",
+        "__curr_arr",
+        "__contract_events",
+        "__checkpoints",
+        "__stats",
+    )
+
+    def __init__(
+        self,
+        contract_events: Iterable[ContractEvent],
+        stats: PipelineStats | None = None,
+    ) -> None:
         self.__arr_events: list[ArrEvent] = []
-        self.__curr_arr = 0
-        for ce in contract_events:
-            self.__handle_contract_event(ce)
+        self.__curr_arr: float = 0
+        self.__contract_events: list[ContractEvent] = []
+        # State before each processed contract event as (number of arr events,
+        # last arr event, current arr). Handling a contract event can only pop
+        # the last arr event, so this is enough to rewind to any event. Most
+        # streams are never updated, so these are only recorded from the first
+        # update on.
+        self.__checkpoints: list[tuple[int, ArrEvent | None, float]] = []
+        # Stats only record the initial replay, so later amendments are not
+        # counted and the stream does not keep them alive or pickle them
+        self.__stats = stats
+        try:
+            self.extend(contract_events)
+        finally:
+            self.__stats = None
 
     def __getitem__(self, index: int) -> ArrEvent:
         return self.__arr_events.__getitem__(index)
@@ -135,16 +457,197 @@ class ArrEventStream(Sequence[ArrEvent]):
     def __len__(self) -> int:
         return self.__arr_events.__len__()
 
+    @property
+    def contract_events(self) -> Sequence[ContractEvent]:
+        return self.__contract_events
+
+    def to_array(self) -> np.ndarray:
+        events = np.empty(len(self.__arr_events), dtype=ARR_EVENT_DTYPE)
+        events["ordinal"] = [ae.event_ordinal for ae in self.__arr_events]
+        events["event_type"] = [
+            ARR_EVENT_CODES[ae.event_type] for ae in self.__arr_events
+        ]
+        events["arr_change"] = [ae.arr_change for ae in self.__arr_events]
+        return events
+
+    def contract_event_indices(self) -> np.ndarray:
+        # Position in contract_events of the contract event behind each arr event
+        positions = {id(ce): i for i, ce in enumerate(self.__contract_events)}
+        return np.array(
+            [positions[id(ae.contract_event)] for ae in self.__arr_events],
+            dtype=np.int32,
+        )
+
+    @classmethod
+    def from_columns(
+        cls,
+        contract_events: Iterable[ContractEvent],
+        contract_event_indices: np.ndarray,
+        event_types: np.ndarray,
+        arr_changes: np.ndarray,
+    ) -> Self:
+        # Restores a computed stream without running the state machine. The
+        # checkpoints needed to extend it are rebuilt on the first extend.
+        stream = cls(())
+        stream.__contract_events = list(contract_events)
+        ces = stream.__contract_events
+        stream.__arr_events = [
+            ArrEvent(ces[index], ARR_EVENT_TYPES[event_type], arr_change)
+            for index, event_type, arr_change in zip(
+                np.asarray(contract_event_indices).tolist(),
+                np.asarray(event_types).tolist(),
+                np.asarray(arr_changes).tolist(),
+            )
+        ]
+        return stream
+
+    @classmethod
+    def iter_events(
+        cls,
+        contract_events: Iterable[ContractEvent],
+        stats: PipelineStats | None = None,
+    ) -> Iterator[ArrEvent]:
+        # Lazily yields the same arr events from sorted contract events. Only the
+        # last arr event can be replaced by a renewal, so it is held back until
+        # the next contract event has been handled.
+        stream = cls(())
+        stream.__stats = stats
+        arr_events = stream.__arr_events
+        prev_ce = None
+        for ce in contract_events:
+            if prev_ce is not None and ce < prev_ce:
+                raise ValueError("Contract events must be sorted to stream arr events")
+            stream.__handle_contract_event(ce)
+            prev_ce = ce
+            if len(arr_events) > 1:
+                yield from arr_events[:-1]
+                del arr_events[:-1]
+        yield from arr_events
+
+    def add_contracts(self, contracts: Iterable[Contract]) -> int:
+        return self.extend(ContractEventStream(contracts))
+
+    def remove_contracts(self, contracts: Iterable[Contract]) -> int:
+        return self.replace_contracts(contracts, ())
+
+    def replace_contracts(
+        self, removed: Iterable[Contract], added: Iterable[Contract]
+    ) -> int:
+        # Returns the index of the first arr event that changed. Only contract
+        # events from the earliest removed or added one on are replayed.
+        return self.__update(_sorted_events(removed), _sorted_events(added))
+
+    def extend(self, contract_events: Iterable[ContractEvent]) -> int:
+        # Returns the index of the first arr event that changed
+        if isinstance(contract_events, ContractEventStream):
+            new_events = list(contract_events)
+        else:
+            new_events = sorted(contract_events)
+        return self.__update([], new_events)
+
+    def __update(
+        self, removed_events: list[ContractEvent], new_events: list[ContractEvent]
+    ) -> int:
+        # Both lists of events must be sorted
+        if not removed_events and not new_events:
+            return len(self.__arr_events)
+        if not self.__contract_events:
+            self.__replay(new_events, checkpoint=False)
+            return 0
+        if len(self.__checkpoints) < len(self.__contract_events):
+            self.__rebuild_checkpoints()
+
+        removed: set[int] = set()
+        for ce in removed_events:
+            removed.add(self.__find(ce, removed))
+        index = min(removed, default=len(self.__contract_events))
+        if new_events:
+            index = min(index, bisect_right(self.__contract_events, new_events[0]))
+        last_kept = self.__get_prev_arr_event()
+        replay: Iterable[ContractEvent] = new_events
+        if index < len(self.__contract_events):
+            # Out of order events are merged with everything processed after them.
+            # Ties keep processed events first, as ContractEventStream keeps
+            # earlier contracts first.
+            kept = [
+                ce
+                for position, ce in enumerate(self.__contract_events[index:], index)
+                if position not in removed
+            ]
+            replay = list(heapq.merge(kept, new_events, key=_contract_event_key))
+            # Taken before restoring, which undoes any renewal of it
+            arr_event_count = self.__checkpoints[index][0]
+            last_kept = (
+                self.__arr_events[arr_event_count - 1] if arr_event_count else None
+            )
+            self.__restore(index)
+
+        kept_count = len(self.__arr_events)
+        self.__replay(replay)
+
+        # The last kept arr event is replaced if it was renewed before or during
+        # the replay
+        if kept_count > 0 and self.__arr_events[kept_count - 1] is not last_kept:
+            return kept_count - 1
+        return kept_count
+
+    def __find(self, ce: ContractEvent, excluded: set[int]) -> int:
+        # Position of an equal contract event that is not already excluded
+        lo = bisect_left(self.__contract_events, ce)
+        hi = bisect_right(self.__contract_events, ce)
+        for position in range(lo, hi):
+            if position not in excluded and self.__contract_events[position] == ce:
+                return position
+        raise ValueError(f"Contract not in ArrEventStream: {ce.contract}")
+
+    def __replay(
+        self, contract_events: Iterable[ContractEvent], checkpoint: bool = True
+    ) -> None:
+        if not checkpoint:
+            for ce in contract_events:
+                self.__contract_events.append(ce)
+                self.__handle_contract_event(ce)
+            return
+        for ce in contract_events:
+            self.__checkpoints.append(
+                (len(self.__arr_events), self.__get_prev_arr_event(), self.__curr_arr)
+            )
+            self.__contract_events.append(ce)
+            self.__handle_contract_event(ce)
+
+    def __rebuild_checkpoints(self) -> None:
+        # Streams that were never updated or were restored from columns only
+        # have their contract events
+        contract_events = self.__contract_events
+        self.__arr_events = []
+        self.__curr_arr = 0
+        self.__contract_events = []
+        self.__checkpoints = []
+        self.__replay(contract_events)
+
+    def __restore(self, index: int) -> None:
+        arr_event_count, prev_arr_event, curr_arr = self.__checkpoints[index]
+        del self.__arr_events[arr_event_count:]
+        if prev_arr_event is not None:
+            self.__arr_events[-1] = prev_arr_event
+        self.__curr_arr = curr_arr
+        del self.__contract_events[index:]
+        del self.__checkpoints[index:]
+
     def __handle_contract_event(self, ce: ContractEvent):
         if self.__curr_arr < 0:
-            raise ValueError("Current arr creating ArrEventStream goes negative")
+            raise self.__state_error(
+                "Current arr creating ArrEventStream goes negative", ce
+            )
         match ce.event_type:
             case ContractEventType.Start:
                 self.__handle_start_contract(ce)
             case ContractEventType.End:
                 self.__handle_end_contract(ce)
             case _:
-                raise ValueError("Invalid contract event type: ", ce.event_type)
+                raise self.__state_error(
+                    f"Invalid contract event type: {ce.event_type}", ce
+                )
 
     def __handle_start_contract(self, ce: ContractEvent) -> None:
         # Handle first contract
@@ -153,12 +656,14 @@ class ArrEventStream(Sequence[ArrEvent]):
             return
 
         # Handle case where previous arr event was a churn
-        if self.__is_prev_event_churn():
+        if self.__is_prev_event_churn(ce):
             self.__handle_prev_churn(ce)
             return
 
         if self.__curr_arr <= 0:
-            raise ValueError("Current ARR is 0 or less without preceeding churn event")
+            raise self.__state_error(
+                "Current ARR is 0 or less without preceeding churn event", ce
+            )
 
         self.__handle_expansion(ce)
 
@@ -166,11 +671,13 @@ class ArrEventStream(Sequence[ArrEvent]):
         # Ensure that state hasn't been corrupted
         # check to make sure that there is a previous arr event
         if self.__get_prev_arr_event() is None:
-            raise ValueError(
-                "Received contract end event and previous ARR event is None"
+            raise self.__state_error(
+                "Received contract end event and previous ARR event is None", ce
             )
         if self.__curr_arr == 0:
-            raise ValueError("Recieved contract end event when current ARR is 0: ", ce)
+            raise self.__state_error(
+                "Recieved contract end event when current ARR is 0", ce
+            )
 
         if self.__is_prev_early_renewal(ce):
             self.__handle_early_renewal(ce)
@@ -184,8 +691,10 @@ class ArrEventStream(Sequence[ArrEvent]):
             self.__handle_downsell(ce)
             return
 
-        raise RuntimeError(
-            "Unexpected state - neither churn, early renewal or downsell on ending contract"
+        raise self.__state_error(
+            "Unexpected state - neither churn, early renewal or downsell on ending "
+            "contract",
+            ce,
         )
 
     def __is_churn(self, ce: ContractEvent) -> bool:
@@ -198,10 +707,14 @@ class ArrEventStream(Sequence[ArrEvent]):
         return self.__is_contract_continuous(ce)
 
     def __handle_churn(self, ce: ContractEvent) -> None:
+        if self.__stats is not None:
+            self.__stats.branches["churn"] += 1
         self.__arr_events.append(ArrEvent(ce, ArrEventType.Churn, -self.__curr_arr))
         self.__curr_arr = 0
 
     def __handle_downsell(self, ce: ContractEvent) -> None:
+        if self.__stats is not None:
+            self.__stats.branches["downsell"] += 1
         self.__arr_events.append(ArrEvent(ce, ArrEventType.Downsell, ce.arr_change))
         self.__curr_arr += ce.arr_change
 
@@ -214,18 +727,27 @@ class ArrEventStream(Sequence[ArrEvent]):
         return self.__get_prev_arr_event() is None
 
     def __handle_new_arr(self, ce: ContractEvent) -> None:
+        if self.__stats is not None:
+            self.__stats.branches["new"] += 1
         self.__arr_events.append(ArrEvent(ce, ArrEventType.New, ce.arr_change))
         self.__curr_arr += ce.arr_change
 
-    def __is_prev_event_churn(self) -> bool:
+    def __is_prev_event_churn(self, ce: ContractEvent) -> bool:
         prev_arr = self.__get_prev_arr_event()
         result = prev_arr is not None and prev_arr.event_type == ArrEventType.Churn
         if result and self.__curr_arr != 0:
-            raise ValueError("Previous event was churn but curr_arr is not 0")
+            raise self.__state_error(
+                "Previous event was churn but curr_arr is not 0", ce
+            )
         return result
 
+    def __state_error(self, message: str, ce: ContractEvent) -> ArrStateError:
+        return ArrStateError(message, ce, self.__curr_arr, self.__get_prev_arr_event())
+
     def __handle_prev_churn(self, ce: ContractEvent) -> None:
         if self.__is_contract_continuous(ce):
+            if self.__stats is not None:
+                self.__stats.branches["renewal"] += 1
             self.__handle_renewal(ce)
             return
         self.__handle_new_arr(ce)
@@ -233,10 +755,9 @@ class ArrEventStream(Sequence[ArrEvent]):
     def __is_contract_continuous(self, ce: ContractEvent) -> bool:
         prev_arr = self.__get_prev_arr_event()
 
-        return prev_arr is not None and within_days(
-            prev_arr.event_date,
-            ce.event_date,
-            MAX_RENEWAL_GAP_DAYS,
+        return (
+            prev_arr is not None
+            and abs(ce.event_ordinal - prev_arr.event_ordinal) <= MAX_RENEWAL_GAP_DAYS
         )
 
     def __handle_renewal(self, ce: ContractEvent) -> None:
@@ -260,17 +781,21 @@ class ArrEventStream(Sequence[ArrEvent]):
         self.__curr_arr += next_arr_change
 
     def __handle_early_renewal(self, ce: ContractEvent) -> None:
+        if self.__stats is not None:
+            self.__stats.branches["early_renewal"] += 1
         prev_arr_event = self.__get_prev_arr_event()
         assert prev_arr_event is not None
         # Logic is the same for handling the renewal
         self.__handle_renewal(prev_arr_event.contract_event)
 
     def __handle_expansion(self, ce: ContractEvent) -> None:
+        if self.__stats is not None:
+            self.__stats.branches["expansion"] += 1
         self.__arr_events.append(ArrEvent(ce, ArrEventType.Expansion, ce.arr_change))
         self.__curr_arr += ce.arr_change
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ArrInterval:
     date_interval: P.Interval
     arr: float
@@ -279,20 +804,183 @@ class ArrInterval:
         return d in self.date_interval
 
 
-class ArrIntervalTimeline:
+# (lower, upper, left closed, right closed, arr)
+_IntervalRow = tuple[float, float, int, int, float]
+
+ARR_INTERVAL_DTYPE = np.dtype(
+    [
+        ("lower", np.float64),
+        ("upper", np.float64),
+        ("left_closed", np.int8),
+        ("right_closed", np.int8),
+        ("arr", np.float64),
+    ]
+)
+# Field names in the order of the timeline's columns
+_ARR_INTERVAL_FIELDS = tuple(ARR_INTERVAL_DTYPE.fields or ())
 
-    __slots__ = "__interval_list"
 
-    def __init__(self, ae_stream: ArrEventStream):
-        self.__interval_list: list[ArrInterval] = list()
-        self.__add_arr_event_stream(ae_stream)
+class ArrIntervalTimeline:
 
-    def __add_arr_event_stream(self, ae_stream: ArrEventStream) -> None:
+    __slots__ = (
+        "__lowers",
+        "__uppers",
+        "__left_closed",
+        "__right_closed",
+        "__arrs",
+        "__checkpoints",
+        "__starts",
+        "__ends",
+        "__positions",
+        "__views",
+        "__areas",
+    )
+
+    def __init__(self, ae_stream: Sequence[ArrEvent]):
+        self.__clear()
+        self.__add_arr_events(ae_stream, 0, False)
+        self.__build_index(0)
+
+    @classmethod
+    def from_array(cls, intervals: np.ndarray) -> Self:
+        # Restores a timeline from to_array output. Like a newly built timeline,
+        # it has no checkpoints until it is first updated.
+        timeline = cls.__new__(cls)
+        timeline.__clear()
+        for column, name in zip(timeline.__columns(), _ARR_INTERVAL_FIELDS):
+            values = np.asarray(intervals[name], dtype=np.dtype(column.typecode))
+            column.frombytes(values.tobytes())
+        timeline.__build_index(0)
+        return timeline
+
+    @classmethod
+    def iter_intervals(cls, arr_events: Iterable[ArrEvent]) -> Iterator[ArrInterval]:
+        # Lazily yields the same intervals as a timeline built from arr_events.
+        # Only the last interval can still be extended or closed, so it is held
+        # back until the next arr event has been added.
+        timeline = cls.__new__(cls)
+        timeline.__clear()
+        arrs = timeline.__arrs
         curr = None
-        for next in ae_stream:
+        for next in arr_events:
+            timeline.__add_arr_event_pair(curr, next)
+            curr = next
+            if len(arrs) > 1:
+                for position in range(len(arrs) - 1):
+                    yield timeline.__create_interval(position)
+                for column in timeline.__columns():
+                    del column[:-1]
+        timeline.__add_arr_event_pair(curr, None)
+        for position in range(len(arrs)):
+            yield timeline.__create_interval(position)
+
+    def to_array(self) -> np.ndarray:
+        intervals = np.empty(len(self.__arrs), dtype=ARR_INTERVAL_DTYPE)
+        for column, name in zip(self.__columns(), _ARR_INTERVAL_FIELDS):
+            intervals[name] = np.frombuffer(column, dtype=np.dtype(column.typecode))
+        return intervals
+
+    def __clear(self) -> None:
+        # Intervals are stored as parallel arrays of bound ordinals (infinite
+        # when unbounded), closedness flags and arr. portion intervals are only
+        # created when ArrInterval objects are requested.
+        self.__lowers = array("d")
+        self.__uppers = array("d")
+        self.__left_closed = array("b")
+        self.__right_closed = array("b")
+        self.__arrs = array("d")
+        # (number of intervals, last interval) before each arr event pair, which
+        # are only recorded from the first update on
+        self.__checkpoints: list[tuple[int, _IntervalRow | None]] = []
+        # First and last day contained in each non-empty interval, kept in
+        # lists as bisect is notably slower over arrays
+        self.__starts: list[float] = []
+        self.__ends: list[float] = []
+        self.__positions: list[int] = []
+        # ArrInterval objects already handed out, by position
+        self.__views: list[ArrInterval | None] = []
+        # Prefix sums of arr * days over the indexed intervals
+        self.__areas: list[float] = [0.0]
+
+    def update(self, ae_stream: Sequence[ArrEvent], from_index: int = 0) -> None:
+        # Intervals produced by arr events before from_index are kept as they are
+        if not self.__checkpoints:
+            # Replaying the kept arr events records their checkpoints and leaves
+            # the same intervals, so views of them stay valid
+            for column in self.__columns():
+                del column[:]
+            self.__add_arr_events(ae_stream[:from_index], 0, True, close=False)
+        elif from_index < len(self.__checkpoints):
+            self.__restore(from_index)
+        first_position = max(len(self.__arrs) - 1, 0)
+        self.__add_arr_events(ae_stream, from_index, True)
+        self.__build_index(first_position)
+
+    def __add_arr_events(
+        self,
+        ae_stream: Sequence[ArrEvent],
+        from_index: int,
+        checkpoint: bool,
+        close: bool = True,
+    ) -> None:
+        # Adds the pairs from arr event from_index on and, if closing, the open
+        # interval after the last arr event
+        curr = ae_stream[from_index - 1] if from_index > 0 else None
+        for index in range(from_index, len(ae_stream)):
+            next = ae_stream[index]
+            if checkpoint:
+                self.__save_checkpoint()
             self.__add_arr_event_pair(curr, next)
             curr = next
-        self.__add_arr_event_pair(curr, None)
+        if close:
+            if checkpoint:
+                self.__save_checkpoint()
+            self.__add_arr_event_pair(curr, None)
+
+    def __save_checkpoint(self) -> None:
+        last_row = self.__row(len(self.__arrs) - 1) if self.__arrs else None
+        self.__checkpoints.append((len(self.__arrs), last_row))
+
+    def __restore(self, index: int) -> None:
+        interval_count, last_row = self.__checkpoints[index]
+        for column in self.__columns():
+            del column[interval_count:]
+        if last_row is not None:
+            for column, value in zip(self.__columns(), last_row):
+                column[-1] = value
+        del self.__checkpoints[index:]
+
+    def __columns(self) -> tuple[array, ...]:
+        return (
+            self.__lowers,
+            self.__uppers,
+            self.__left_closed,
+            self.__right_closed,
+            self.__arrs,
+        )
+
+    def __row(self, position: int) -> _IntervalRow:
+        return (
+            self.__lowers[position],
+            self.__uppers[position],
+            self.__left_closed[position],
+            self.__right_closed[position],
+            self.__arrs[position],
+        )
+
+    def __append(
+        self,
+        lower: float,
+        upper: float,
+        left_closed: bool,
+        right_closed: bool,
+        arr: float,
+    ) -> None:
+        self.__lowers.append(lower)
+        self.__uppers.append(upper)
+        self.__left_closed.append(left_closed)
+        self.__right_closed.append(right_closed)
+        self.__arrs.append(arr)
 
     def __add_arr_event_pair(
         self, curr: ArrEvent | None, next: ArrEvent | None
@@ -300,73 +988,739 @@ class ArrIntervalTimeline:
         if curr is None:
             if next is None:
                 raise ValueError("both curr and next cannot be None")
-            self.__interval_list.append(ArrInterval(P.open(-P.inf, next.event_date), 0))
+            self.__append(-math.inf, next.event_ordinal, False, False, 0)
         elif next is None:
             if curr is None:
                 raise ValueError("both curr and next cannot be None")
             # change last interval to be fully closed
-            last_interval = self.__interval_list[-1]
-            last_interval.date_interval = last_interval.date_interval.replace(
-                right=P.CLOSED
-            )
+            self.__right_closed[-1] = True
 
-            self.__interval_list.append(ArrInterval(P.open(curr.event_date, P.inf), 0))
+            self.__append(curr.event_ordinal, math.inf, False, False, 0)
         elif curr.event_type is ArrEventType.Renewal:
             if next.event_type not in [ArrEventType.Expansion, ArrEventType.Downsell]:
                 # If we get a renewal event without a following expansion or downsell
                 # we extend the existing interval
-                curr_interval = self.__interval_list[-1]
-                if curr_interval is None:
+                if not self.__arrs:
                     raise RuntimeError(
                         "current interval should not be None with a 0 ARR change"
                     )
-                curr_interval.date_interval = curr_interval.date_interval.replace(
-                    upper=next.event_date
-                )
+                self.__uppers[-1] = next.event_ordinal
             else:
                 # Do nothing for a renewal followed by an expansion or downsell
                 pass
         else:
-            last_interval = self.__interval_list[-1]
-            new_arr = last_interval.arr + curr.arr_change
+            new_arr = self.__arrs[-1] + curr.arr_change
             # while contracs are usually fully closed intervals, the way we've
             # built the ArrEventStream means that these need to be
 
-            # TODO: Fix
-            self.__interval_list.append(
-                ArrInterval(P.closed(curr.event_date, next.event_date - 1), new_arr)
-            )
+            self.__append(curr.event_ordinal, next.event_ordinal, True, False, new_arr)
+
+    def __build_index(self, first_position: int) -> None:
+        # Lookups bisect over the first day of each interval instead of testing
+        # each interval
+        cut = bisect_left(self.__positions, first_position)
+        del self.__starts[cut:]
+        del self.__ends[cut:]
+        del self.__positions[cut:]
+        del self.__areas[cut + 1 :]
+        del self.__views[first_position:]
+        self.__views.extend([None] * (len(self.__arrs) - first_position))
+        for position in range(first_position, len(self.__arrs)):
+            start = self.__lowers[position] + (not self.__left_closed[position])
+            end = self.__uppers[position] - (not self.__right_closed[position])
+            if start > end:
+                continue
+            self.__starts.append(_int_if_finite(start))
+            self.__ends.append(_int_if_finite(end))
+            self.__positions.append(position)
+            # Unbounded intervals always have 0 arr
+            arr = self.__arrs[position]
+            area = arr * (end - start + 1) if arr else 0.0
+            self.__areas.append(self.__areas[-1] + area)
+
+    def __interval(self, position: int) -> ArrInterval:
+        view = self.__views[position]
+        if view is None:
+            view = self.__views[position] = self.__create_interval(position)
+        return view
+
+    def __create_interval(self, position: int) -> ArrInterval:
+        lower, upper, left_closed, right_closed, arr = self.__row(position)
+        date_interval = P.Interval.from_atomic(
+            P.CLOSED if left_closed else P.OPEN,
+            -P.inf if lower == -math.inf else date.fromordinal(int(lower)),
+            P.inf if upper == math.inf else date.fromordinal(int(upper)),
+            P.CLOSED if right_closed else P.OPEN,
+        )
+        return ArrInterval(date_interval, arr)
 
     def __getitem__(self, d: date) -> ArrInterval:
-        for interval in self.__interval_list:
-            if d in interval:
-                return interval
-        raise KeyError(d)
+        ordinal = d.toordinal()
+        index = bisect_right(self.__starts, ordinal) - 1
+        if index < 0 or ordinal > self.__ends[index]:
+            raise KeyError(d)
+        position = self.__positions[index]
+        view = self.__views[position]
+        return view if view is not None else self.__interval(position)
+
+    def slice(self, start: date, end: date) -> list[ArrInterval]:
+        # Intervals containing at least one day from start to end inclusive
+        if end < start:
+            return []
+        first = max(bisect_right(self.__starts, start.toordinal()) - 1, 0)
+        if self.__ends[first] < start.toordinal():
+            first += 1
+        last = bisect_right(self.__starts, end.toordinal())
+        return [self.__interval(p) for p in self.__positions[first:last]]
+
+    def integrate(self, start: date, end: date) -> float:
+        # Sum of arr over every day from start to end inclusive, in arr * days.
+        # Dividing by 365 gives the revenue recognized over the range.
+        if end < start:
+            return 0.0
+        return self.__cumulative_area(end.toordinal()) - self.__cumulative_area(
+            start.toordinal() - 1
+        )
+
+    def __cumulative_area(self, ordinal: int) -> float:
+        # Sum of arr over every day up to and including ordinal
+        index = bisect_right(self.__starts, ordinal) - 1
+        if index < 0:
+            return 0.0
+        if ordinal > self.__ends[index]:
+            return self.__areas[index + 1]
+        arr = self.__arrs[self.__positions[index]]
+        partial = arr * (ordinal - self.__starts[index] + 1) if arr else 0.0
+        return self.__areas[index] + partial
+
+    def change_points(self, start: date | None = None) -> Iterator[tuple[int, float]]:
+        # (first day ordinal, arr change) for every day on which arr changes,
+        # from start on when given
+        first = 1
+        if start is not None:
+            first = max(bisect_left(self.__starts, start.toordinal()), 1)
+        prev_arr = self.__arrs[self.__positions[first - 1]]
+        for ordinal, position in zip(self.__starts[first:], self.__positions[first:]):
+            arr = self.__arrs[position]
+            if arr != prev_arr:
+                yield int(ordinal), arr - prev_arr
+            prev_arr = arr
+
+    def to_series(self, start: date, end: date, freq: str = "D") -> np.ndarray:
+        change_points = np.array(list(self.change_points()), dtype=np.float64)
+        ordinals, deltas = change_points.reshape(-1, 2).T
+        rows = np.zeros(len(ordinals), dtype=np.int64)
+        samples = _sample_ordinals(start, end, freq)
+        return _step_series(rows, ordinals, deltas, 1, samples)[0]
+
+    def arr_at(self, dates: Iterable[date]) -> list[float]:
+        dates = list(dates)
+        ordinals = [d.toordinal() for d in dates]
+        order: Iterable[int] = range(len(ordinals))
+        if any(a > b for a, b in zip(ordinals, ordinals[1:])):
+            order = sorted(order, key=ordinals.__getitem__)
+
+        result = [0.0] * len(ordinals)
+        index = 0
+        last_index = len(self.__starts) - 1
+        for i in order:
+            ordinal = ordinals[i]
+            while index < last_index and self.__starts[index + 1] <= ordinal:
+                index += 1
+            if ordinal < self.__starts[index] or ordinal > self.__ends[index]:
+                raise KeyError(dates[i])
+            result[i] = self.__arrs[self.__positions[index]]
+        return result
 
     def __iter__(self) -> Iterator[ArrInterval]:
-        return self.__interval_list.__iter__()
+        for position in range(len(self.__arrs)):
+            yield self.__interval(position)
+
+    def __len__(self) -> int:
+        return len(self.__arrs)
+
+
+ArrLoader = Callable[[], tuple[ArrEventStream, ArrIntervalTimeline]]
+
+# Approximate memory held by a customer's computed arr per contract, measured
+# with tracemalloc on generated contracts
+_COMPUTED_BYTES_PER_CONTRACT = 1400
+
+
+class ArrLruCache:
+    # Tracks which customers hold computed arr in memory and evicts the least
+    # recently used once either bound is exceeded
+
+    __slots__ = (
+        "max_customers",
+        "max_bytes",
+        "hits",
+        "misses",
+        "evictions",
+        "__sizes",
+        "__bytes",
+    )
+
+    def __init__(
+        self, max_customers: int | None = None, max_bytes: int | None = None
+    ) -> None:
+        self.max_customers = max_customers
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Estimated bytes by customer, least recently used first
+        self.__sizes: OrderedDict[Customer, int] = OrderedDict()
+        self.__bytes = 0
+
+    def __contains__(self, customer: object) -> bool:
+        return customer in self.__sizes
+
+    def __len__(self) -> int:
+        return self.__sizes.__len__()
+
+    @property
+    def bytes(self) -> int:
+        return self.__bytes
+
+    def touch(self, customer: "Customer") -> None:
+        self.hits += 1
+        self.__sizes.move_to_end(customer)
+
+    def add(self, customer: "Customer") -> None:
+        self.discard(customer)
+        size = _COMPUTED_BYTES_PER_CONTRACT * len(customer.contracts)
+        self.__sizes[customer] = size
+        self.__bytes += size
+        while len(self.__sizes) > 1 and self.__is_full():
+            evicted, evicted_size = self.__sizes.popitem(last=False)
+            self.__bytes -= evicted_size
+            self.evictions += 1
+            evicted.evict()
+
+    def discard(self, customer: "Customer") -> None:
+        size = self.__sizes.pop(customer, None)
+        if size is not None:
+            self.__bytes -= size
+
+    def __is_full(self) -> bool:
+        if self.max_customers is not None and len(self.__sizes) > self.max_customers:
+            return True
+        return self.max_bytes is not None and self.__bytes > self.max_bytes
+
+
+@dataclass(frozen=True, slots=True)
+class ArrAmendment:
+    # A customer's arr change points before and after its contracts were
+    # amended, from the first day on which its arr changed
+    customer_id: str
+    from_date: date
+    old_change_points: list[tuple[int, float]]
+    new_change_points: list[tuple[int, float]]
 
 
 class Customer:
-    def __init__(self, id: str) -> None:
+    def __init__(
+        self,
+        id: str,
+        contracts: Iterable[Contract] = (),
+        arr_cache: ArrLruCache | None = None,
+    ) -> None:
         self.id: str = id
-        self.__contracts: list[Contract] = []
-        self.__arr_events: list[ArrEvent] = []
+        # Any sequence until contracts are added, when it becomes a list
+        self.__contracts: Sequence[Contract] = []
+        self.__arr_events: ArrEventStream | None = None
+        self.__arr_timeline: ArrIntervalTimeline | None = None
+        # Restores previously computed arr when it is needed
+        self.__arr_loader: ArrLoader | None = None
+        self.__arr_cache = arr_cache
+        self.add_contracts(contracts)
 
     def __repr__(self) -> str:
         return str(self.__dict__)
 
+    def add_contracts(self, contracts: Iterable[Contract]) -> None:
+        contracts = list(contracts)
+        self.__check_customer(contracts)
+        if not contracts:
+            return
+        # Arr that is not in memory is recomputed when next needed
+        self.__arr_loader = None
+        if not isinstance(self.__contracts, list):
+            self.__contracts = list(self.__contracts)
+        self.__contracts.extend(contracts)
+        if self.__arr_events is None:
+            return
+        if self.__arr_timeline is None:
+            self.__arr_events = None
+            return
+        first_changed = self.__arr_events.add_contracts(contracts)
+        self.__arr_timeline.update(self.__arr_events, first_changed)
+        if self.__arr_cache is not None:
+            self.__arr_cache.add(self)
+
+    def replace_contracts(
+        self, removed: Iterable[Contract], added: Iterable[Contract]
+    ) -> ArrAmendment | None:
+        # Amends contracts in place, only replaying arr from the earliest
+        # removed or added contract event. Returns the arr before and after from
+        # the first day it changed, or None if it did not change.
+        removed = list(removed)
+        added = list(added)
+        self.__check_customer(added)
+        contracts = list(self.__contracts)
+        for contract in removed:
+            try:
+                contracts.remove(contract)
+            except ValueError:
+                raise ValueError(
+                    f"Contract not found for {self.id}: {contract}"
+                ) from None
+        if not removed and not added:
+            return None
 
-class SaasData:
-    def __init__(self) -> None:
+        arr_events: ArrEventStream | None = None
+        arr_timeline: ArrIntervalTimeline | None = None
+        start: date | None = None
+        old_change_points: list[tuple[int, float]] = []
+        try:
+            arr_events = self.arr_events
+            arr_timeline = self.arr_timeline
+        except ArrStateError:
+            # Arr that cannot be computed is not part of any aggregate
+            pass
+        else:
+            # Arr can change from the last arr event before the earliest changed
+            # contract event, as it can be renewed or become the last arr event,
+            # and from up to a renewal gap before it
+            ordinal = (
+                min(min(c.start_date, c.end_date).toordinal() for c in removed + added)
+                - MAX_RENEWAL_GAP_DAYS
+            )
+            index = bisect_left(arr_events, ordinal, key=attrgetter("event_ordinal"))
+            if index > 0:
+                ordinal = arr_events[index - 1].event_ordinal
+            start = date.fromordinal(ordinal)
+            old_change_points = list(arr_timeline.change_points(start))
+
+        # Contracts are only replaced once the new arr has been computed, so a
+        # failed amendment leaves the customer unchanged
+        contracts.extend(added)
+        new_change_points: list[tuple[int, float]] = []
+        if not contracts:
+            self.evict()
+            self.__arr_loader = None
+            self.__contracts = contracts
+        else:
+            if arr_events is None or arr_timeline is None:
+                arr_events, arr_timeline = compute_arr(contracts)
+            else:
+                try:
+                    first_changed = arr_events.replace_contracts(removed, added)
+                    arr_timeline.update(arr_events, first_changed)
+                except Exception:
+                    # The partially replayed arr is loaded or recomputed from the
+                    # unchanged contracts when next needed
+                    self.evict()
+                    raise
+            self.__contracts = contracts
+            self.set_arr(arr_events, arr_timeline)
+            new_change_points = list(arr_timeline.change_points(start))
+
+        first = 0
+        while (
+            first < min(len(old_change_points), len(new_change_points))
+            and old_change_points[first] == new_change_points[first]
+        ):
+            first += 1
+        changed = [
+            cps[first][0]
+            for cps in (old_change_points, new_change_points)
+            if first < len(cps)
+        ]
+        if not changed:
+            return None
+        return ArrAmendment(
+            self.id,
+            date.fromordinal(min(changed)),
+            old_change_points[first:],
+            new_change_points[first:],
+        )
+
+    def __check_customer(self, contracts: Iterable[Contract]) -> None:
+        for contract in contracts:
+            if contract.customer_id != self.id:
+                raise ValueError(
+                    f"Contract for customer {contract.customer_id} added to {self.id}"
+                )
+
+    def set_contracts(self, contracts: Sequence[Contract]) -> None:
+        # Replaces the contracts with a sequence that is trusted to only hold
+        # this customer's contracts, so it is not iterated
+        self.evict()
+        self.__arr_loader = None
+        self.__contracts = contracts
+
+    def set_arr(
+        self, arr_events: ArrEventStream, arr_timeline: ArrIntervalTimeline
+    ) -> None:
+        self.__arr_events = arr_events
+        self.__arr_timeline = arr_timeline
+        self.__arr_loader = None
+        if self.__arr_cache is not None:
+            self.__arr_cache.add(self)
+
+    def set_arr_loader(self, arr_loader: ArrLoader) -> None:
+        self.evict()
+        self.__arr_loader = arr_loader
+
+    def evict(self) -> None:
+        # Drops computed arr from memory, keeping any loader to restore it
+        self.__arr_events = None
+        self.__arr_timeline = None
+        if self.__arr_cache is not None:
+            self.__arr_cache.discard(self)
+
+    def compute(self, stats: PipelineStats | None = None) -> None:
+        if stats is None:
+            self.set_arr(*compute_arr(self.__contracts))
+            return
+        start = perf_counter()
+        self.set_arr(*compute_arr(self.__contracts, stats))
+        stats.record_customer(self.id, perf_counter() - start)
+
+    @property
+    def contracts(self) -> Sequence[Contract]:
+        return self.__contracts
+
+    @property
+    def is_computed(self) -> bool:
+        return self.__arr_events is not None or self.__arr_loader is not None
+
+    @property
+    def arr_events(self) -> ArrEventStream:
+        if self.__arr_events is None:
+            self.__load_or_compute()
+        elif self.__arr_cache is not None:
+            self.__arr_cache.touch(self)
+        assert self.__arr_events is not None
+        return self.__arr_events
+
+    @property
+    def arr_timeline(self) -> ArrIntervalTimeline:
+        if self.__arr_timeline is None:
+            self.__load_or_compute()
+        elif self.__arr_cache is not None:
+            self.__arr_cache.touch(self)
+        assert self.__arr_timeline is not None
+        return self.__arr_timeline
+
+    def __load_or_compute(self) -> None:
+        if self.__arr_cache is not None:
+            self.__arr_cache.misses += 1
+        if self.__arr_loader is None:
+            self.compute()
+            return
+        self.__arr_events, self.__arr_timeline = self.__arr_loader()
+        if self.__arr_cache is not None:
+            self.__arr_cache.add(self)
+
+
+def compute_arr(
+    contracts: Iterable[Contract], stats: PipelineStats | None = None
+) -> tuple[ArrEventStream, ArrIntervalTimeline]:
+    if stats is None:
+        arr_events = ArrEventStream(ContractEventStream(contracts))
+        return arr_events, ArrIntervalTimeline(arr_events)
+
+    with stats.stage("contract_event_stream") as stage:
+        contract_events = ContractEventStream(contracts)
+        stage.items = len(contract_events)
+    with stats.stage("arr_event_stream") as stage:
+        arr_events = ArrEventStream(contract_events, stats)
+        # Contract events handled, as for the state machine branch counts
+        stage.items = len(contract_events)
+    stats.arr_events.update(ae.event_type for ae in arr_events)
+    with stats.stage("arr_interval_timeline") as stage:
+        arr_timeline = ArrIntervalTimeline(arr_events)
+        stage.items = len(arr_timeline)
+    return arr_events, arr_timeline
+
+
+def _compute_instrumented(
+    contracts: Sequence[Contract], stats: PipelineStats | None = None
+) -> tuple[ArrEventStream, ArrIntervalTimeline, PipelineStats, float]:
+    if stats is None:
+        stats = PipelineStats()
+    start = perf_counter()
+    arr_events, arr_timeline = compute_arr(contracts, stats)
+    return arr_events, arr_timeline, stats, perf_counter() - start
+
+
+@dataclass(frozen=True, slots=True)
+class CustomerDiagnostic:
+    customer_id: str
+    message: str
+    contract: Contract | None = None
+    # State of the ArrEventStream before the contract event that failed
+    contract_event: ContractEvent | None = None
+    curr_arr: float | None = None
+    prev_arr_event: ArrEvent | None = None
+
+    @classmethod
+    def from_exception(cls, customer_id: str, e: Exception) -> Self:
+        if isinstance(e, ArrStateError):
+            return cls(
+                customer_id,
+                str(e),
+                e.contract_event.contract,
+                e.contract_event,
+                e.curr_arr,
+                e.prev_arr_event,
+            )
+        return cls(customer_id, f"{type(e).__name__}: {e}")
+
+
+class SaasData(Mapping[str, Customer]):
+    def __init__(
+        self,
+        contracts: Iterable[Contract] = (),
+        max_computed_customers: int | None = None,
+        max_computed_bytes: int | None = None,
+    ) -> None:
+        # Customers compute arr on first access and the least recently used are
+        # evicted once the bounds are exceeded
+        self.__arr_cache = ArrLruCache(max_computed_customers, max_computed_bytes)
         self.__customers: dict[str, Customer] = {}
+        self.add_contracts(contracts)
+
+    def __getitem__(self, customer_id: str) -> Customer:
+        return self.__customers[customer_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return self.__customers.__iter__()
+
+    def __len__(self) -> int:
+        return self.__customers.__len__()
+
+    def add_contracts(self, contracts: Iterable[Contract]) -> None:
+        grouped: dict[str, list[Contract]] = {}
+        for contract in contracts:
+            grouped.setdefault(contract.customer_id, []).append(contract)
+        for customer_id, customer_contracts in grouped.items():
+            customer = self.__customers.get(customer_id)
+            if customer is None:
+                self.__customers[customer_id] = Customer(
+                    customer_id, customer_contracts, self.__arr_cache
+                )
+            else:
+                customer.add_contracts(customer_contracts)
+
+    def update_contracts(
+        self, amendments: Iterable[tuple[Contract, Contract]]
+    ) -> list[ArrAmendment]:
+        # Replaces the first contract of each pair with the second, which must
+        # be for the same customer
+        removed: dict[str, list[Contract]] = {}
+        added: dict[str, list[Contract]] = {}
+        for old, new in amendments:
+            if old.customer_id != new.customer_id:
+                raise ValueError(
+                    f"Contract for customer {old.customer_id} amended to "
+                    f"{new.customer_id}"
+                )
+            removed.setdefault(old.customer_id, []).append(old)
+            added.setdefault(new.customer_id, []).append(new)
+        return self.__replace_contracts(removed, added)
+
+    def remove_contracts(self, contracts: Iterable[Contract]) -> list[ArrAmendment]:
+        # Customers left without contracts are removed
+        removed: dict[str, list[Contract]] = {}
+        for contract in contracts:
+            removed.setdefault(contract.customer_id, []).append(contract)
+        return self.__replace_contracts(removed, {})
+
+    def __replace_contracts(
+        self, removed: dict[str, list[Contract]], added: dict[str, list[Contract]]
+    ) -> list[ArrAmendment]:
+        # Returns how each customer's arr changed, which is enough to patch
+        # aggregates such as PortfolioArrTimeline.apply. Raises without
+        # changing any customer if one cannot be amended.
+        for customer_id in removed:
+            if customer_id not in self.__customers:
+                raise KeyError(customer_id)
+        amendments = []
+        # Previous contracts of customers amended so far, which are restored if
+        # a later customer fails so that the batch applies all or nothing
+        amended: list[tuple[Customer, Sequence[Contract]]] = []
+        try:
+            for customer_id, customer_removed in removed.items():
+                customer = self.__customers[customer_id]
+                previous = customer.contracts
+                amendment = customer.replace_contracts(
+                    customer_removed, added.get(customer_id, ())
+                )
+                amended.append((customer, previous))
+                if amendment is not None:
+                    amendments.append(amendment)
+        except Exception:
+            for customer, previous in amended:
+                customer.set_contracts(previous)
+            raise
+        for customer, _ in amended:
+            if not customer.contracts:
+                del self.__customers[customer.id]
+        return amendments
+
+    def add_customer(
+        self, customer_id: str, contracts: Sequence[Contract] = ()
+    ) -> Customer:
+        if customer_id in self.__customers:
+            raise ValueError(f"Customer {customer_id} already exists")
+        customer = Customer(customer_id, (), self.__arr_cache)
+        customer.set_contracts(contracts)
+        self.__customers[customer_id] = customer
+        return customer
+
+    @property
+    def arr_cache(self) -> ArrLruCache:
+        return self.__arr_cache
+
+    def arr_matrix(self, start: date, end: date, freq: str = "D") -> np.ndarray:
+        # One row per customer in iteration order and one column per sample date
+        rows: list[int] = []
+        change_points: list[tuple[int, float]] = []
+        for row, customer in enumerate(self.__customers.values()):
+            customer_change_points = list(customer.arr_timeline.change_points())
+            rows.extend([row] * len(customer_change_points))
+            change_points.extend(customer_change_points)
+        ordinals, deltas = np.array(change_points, dtype=np.float64).reshape(-1, 2).T
+        samples = _sample_ordinals(start, end, freq)
+        return _step_series(
+            np.array(rows, dtype=np.int64), ordinals, deltas, len(self), samples
+        )
+
+    def compute(
+        self,
+        max_workers: int | None = None,
+        chunksize: int | None = None,
+        stats: PipelineStats | None = None,
+    ) -> None:
+        customers = [c for c in self.__customers.values() if not c.is_computed]
+        self.__compute(customers, max_workers, chunksize, stats, isolate=False)
+
+    def compute_isolated(
+        self,
+        max_workers: int | None = None,
+        chunksize: int | None = None,
+        stats: PipelineStats | None = None,
+    ) -> list[CustomerDiagnostic]:
+        # Like compute, but customers with invalid contracts or whose arr cannot
+        # be computed are left uncomputed and reported instead of raising
+        customers = [c for c in self.__customers.values() if not c.is_computed]
+        diagnostics = _validate_customers(customers)
+        rejected = {d.customer_id for d in diagnostics}
+        customers = [c for c in customers if c.id not in rejected]
+        diagnostics.extend(
+            self.__compute(customers, max_workers, chunksize, stats, isolate=True)
+        )
+        return diagnostics
+
+    def __compute(
+        self,
+        customers: Sequence[Customer],
+        max_workers: int | None,
+        chunksize: int | None,
+        stats: PipelineStats | None,
+        isolate: bool,
+    ) -> list[CustomerDiagnostic]:
+        if not customers:
+            return []
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        max_workers = min(max_workers, len(customers))
+
+        fn: Callable[[Sequence[Contract]], Any] = compute_arr
+        if stats is not None:
+            # Workers in a process pool record into their own stats which are
+            # merged back here
+            local_stats = stats if max_workers == 1 else None
+            fn = partial(_compute_instrumented, stats=local_stats)
+        if isolate:
+            fn = partial(_compute_isolated, fn)
+
+        diagnostics: list[CustomerDiagnostic] = []
+        results = _map_contracts(fn, customers, max_workers, chunksize)
+        for customer, result in zip(customers, results):
+            if isinstance(result, CustomerDiagnostic):
+                diagnostics.append(result)
+            elif stats is None:
+                customer.set_arr(*result)
+            else:
+                arr_events, arr_timeline, customer_stats, seconds = result
+                customer.set_arr(arr_events, arr_timeline)
+                if customer_stats is not stats:
+                    stats.merge(customer_stats)
+                stats.record_customer(customer.id, seconds)
+        return diagnostics
+
+
+def _map_contracts(
+    fn: Callable[[Sequence[Contract]], Any],
+    customers: Sequence[Customer],
+    max_workers: int,
+    chunksize: int | None,
+) -> Iterator[Any]:
+    contracts = [c.contracts for c in customers]
+    if max_workers == 1:
+        yield from map(fn, contracts)
+        return
+
+    if chunksize is None:
+        # A few chunks per worker balances load against per-task overhead
+        chunksize = max(1, len(customers) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(fn, contracts, chunksize=chunksize)
+
+
+def _validate_customers(customers: Sequence[Customer]) -> list[CustomerDiagnostic]:
+    # Contracts that would fail in the state machine are found for all
+    # customers at once before any arr is computed
+    contracts = [c for customer in customers for c in customer.contracts]
+    if not contracts:
+        return []
+    errors = ContractTable.from_contracts(contracts).validate()
+    return [
+        CustomerDiagnostic(
+            contracts[i].customer_id,
+            f"Invalid contract: {ContractError(errors[i]).name}",
+            contracts[i],
+        )
+        for i in np.flatnonzero(errors).tolist()
+    ]
+
+
+def _compute_isolated(
+    fn: Callable[[Sequence[Contract]], Any], contracts: Sequence[Contract]
+) -> Any:
+    try:
+        return fn(contracts)
+    except (ValueError, RuntimeError) as e:
+        return CustomerDiagnostic.from_exception(contracts[0].customer_id, e)
 
 
 # Date utility functions
 
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _int_if_finite(ordinal: float) -> float:
+    # Bisecting int ordinals against int keys avoids mixed int/float comparisons
+    return int(ordinal) if math.isfinite(ordinal) else ordinal
+
 
 def yearfrac(a: date, b: date, decimals: int = 1, absolute: bool = True) -> float:
-    days = (b - a).days
+    days = b.toordinal() - a.toordinal()
     raw_frac = days / 365.0
     frac = round(raw_frac, decimals)
     if absolute:
@@ -374,6 +1728,60 @@ def yearfrac(a: date, b: date, decimals: int = 1, absolute: bool = True) -> floa
     return frac
 
 
+def _yearfrac_ordinals(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Vectorized equivalent of yearfrac with the default arguments
+    return np.abs(np.round((b - a) / 365.0, 1))
+
+
+def _to_ordinals(dates: Iterable[date] | np.ndarray) -> np.ndarray:
+    if isinstance(dates, np.ndarray) and np.issubdtype(dates.dtype, np.datetime64):
+        days = dates.astype("datetime64[D]").astype(np.int64)
+        return (days + _EPOCH_ORDINAL).astype(np.int32)
+    if isinstance(dates, np.ndarray) and np.issubdtype(dates.dtype, np.integer):
+        return dates.astype(np.int32)
+    return np.fromiter((d.toordinal() for d in dates), dtype=np.int32)
+
+
+def to_datetime64(ordinals: np.ndarray) -> np.ndarray:
+    days = np.asarray(ordinals, dtype=np.int64) - _EPOCH_ORDINAL
+    return days.astype("datetime64[D]")
+
+
+def series_dates(start: date, end: date, freq: str = "D") -> np.ndarray:
+    return to_datetime64(_sample_ordinals(start, end, freq))
+
+
+def _sample_ordinals(start: date, end: date, freq: str) -> np.ndarray:
+    first, last = start.toordinal(), end.toordinal()
+    if freq == "D":
+        return np.arange(first, last + 1, dtype=np.int64)
+    if freq == "M":
+        first_month = np.datetime64(start, "M").astype(np.int64)
+        last_month = np.datetime64(end, "M").astype(np.int64)
+        next_months = np.arange(first_month + 1, last_month + 2).astype("datetime64[M]")
+        ordinals = next_months.astype("datetime64[D]").astype(np.int64) - 1
+        ordinals += _EPOCH_ORDINAL
+        return ordinals[(ordinals >= first) & (ordinals <= last)]
+    raise ValueError(f"Unsupported frequency: {freq}")
+
+
+def _step_series(
+    rows: np.ndarray,
+    ordinals: np.ndarray,
+    deltas: np.ndarray,
+    row_count: int,
+    samples: np.ndarray,
+) -> np.ndarray:
+    # Each arr change is scattered onto the first sample on or after its date and
+    # a cumulative sum across the samples turns the changes into arr values.
+    # Changes after the last sample land in an extra column that is dropped.
+    columns = np.searchsorted(samples, ordinals, side="left")
+    width = len(samples) + 1
+    changes = np.bincount(
+        rows * width + columns, weights=deltas, minlength=row_count * width
+    )
+    return np.cumsum(changes.reshape(row_count, width)[:, :-1], axis=1)
+
+
 def within_days(a: date, b: date, days: int) -> bool:
-    delta = timedelta(days=days)
-    return within_delta(a, b, delta)  # type: ignore
+    return abs(b.toordinal() - a.toordinal()) <= abs(days)
@@ -0,0 +1,230 @@
+import heapq
+import math
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator, Mapping
+from datetime import date
+from itertools import accumulate
+from typing import Self
+
+import numpy as np
+import portion as P
+
+from saasy.models import ArrAmendment, ArrInterval, ArrIntervalTimeline, SaasData
+
+
+class PortfolioArrTimeline:
+
+    __slots__ = ("__starts", "__arrs")
+
+    def __init__(self, timelines: Iterable[ArrIntervalTimeline]) -> None:
+        # Total arr is a step function stored as the first day ordinal of each
+        # step and the arr from that day until the next step
+        self.__starts: list[float] = [-math.inf]
+        self.__arrs: list[float] = [0.0]
+        merged = heapq.merge(*(t.change_points() for t in timelines))
+        self.__add_change_points(merged)
+
+    def apply(self, amendments: Iterable[ArrAmendment]) -> None:
+        # Patches total arr from the earliest day any customer's arr changed
+        amendments = list(amendments)
+        if not amendments:
+            return
+        from_ordinal = min(a.from_date.toordinal() for a in amendments)
+        cut = bisect_left(self.__starts, from_ordinal)
+        # Steps after the first are never unbounded, so their starts are int
+        change_points = [
+            (int(ordinal), arr - prev_arr)
+            for ordinal, arr, prev_arr in zip(
+                self.__starts[cut:], self.__arrs[cut:], self.__arrs[cut - 1 :]
+            )
+        ]
+        for amendment in amendments:
+            change_points.extend(
+                (o, -delta) for o, delta in amendment.old_change_points
+            )
+            change_points.extend(amendment.new_change_points)
+        del self.__starts[cut:]
+        del self.__arrs[cut:]
+        self.__add_change_points(sorted(change_points))
+
+    def __add_change_points(self, change_points: Iterable[tuple[int, float]]) -> None:
+        curr_ordinal = None
+        delta = 0.0
+        for ordinal, arr_change in change_points:
+            if ordinal != curr_ordinal:
+                self.__add_step(curr_ordinal, delta)
+                curr_ordinal = ordinal
+                delta = 0.0
+            delta += arr_change
+        self.__add_step(curr_ordinal, delta)
+
+    def __add_step(self, ordinal: int | None, delta: float) -> None:
+        if ordinal is None or delta == 0:
+            return
+        self.__starts.append(ordinal)
+        self.__arrs.append(self.__arrs[-1] + delta)
+
+    def __getitem__(self, d: date) -> ArrInterval:
+        return self.__interval(bisect_right(self.__starts, d.toordinal()) - 1)
+
+    def __iter__(self) -> Iterator[ArrInterval]:
+        for index in range(len(self.__starts)):
+            yield self.__interval(index)
+
+    def __len__(self) -> int:
+        return len(self.__starts)
+
+    def arr_at(self, dates: Iterable[date]) -> list[float]:
+        ordinals = [d.toordinal() for d in dates]
+        order: Iterable[int] = range(len(ordinals))
+        if any(a > b for a, b in zip(ordinals, ordinals[1:])):
+            order = sorted(order, key=ordinals.__getitem__)
+
+        result = [0.0] * len(ordinals)
+        index = 0
+        last_index = len(self.__starts) - 1
+        for i in order:
+            while index < last_index and self.__starts[index + 1] <= ordinals[i]:
+                index += 1
+            result[i] = self.__arrs[index]
+        return result
+
+    def __interval(self, index: int) -> ArrInterval:
+        start = self.__starts[index]
+        lower = -P.inf if start == -math.inf else date.fromordinal(int(start))
+        if index + 1 < len(self.__starts):
+            upper = date.fromordinal(int(self.__starts[index + 1]))
+        else:
+            upper = P.inf
+        if lower == -P.inf:
+            return ArrInterval(P.open(lower, upper), self.__arrs[index])
+        return ArrInterval(P.closedopen(lower, upper), self.__arrs[index])
+
+
+# Larger than any date ordinal so that (customer, ordinal) pairs can be packed
+# into a single sortable integer key
+_CUSTOMER_KEY_STRIDE = 1 << 22
+
+
+class ArrSnapshotIndex:
+
+    __slots__ = (
+        "__customer_ids",
+        "__customer_codes",
+        "__offsets",
+        "__keys",
+        "__customer_arrs",
+        "__ordinals",
+        "__total_arrs",
+    )
+
+    def __init__(self, timelines: Mapping[str, ArrIntervalTimeline]) -> None:
+        self.__customer_ids: list[str] = list(timelines)
+        self.__customer_codes = {id: code for code, id in enumerate(timelines)}
+        counts = np.zeros(len(self.__customer_ids), dtype=np.int64)
+        change_points: list[tuple[int, float]] = []
+        customer_arrs: list[float] = []
+        for code, timeline in enumerate(timelines.values()):
+            customer_change_points = list(timeline.change_points())
+            counts[code] = len(customer_change_points)
+            change_points.extend(customer_change_points)
+            customer_arrs.extend(
+                accumulate(delta for _, delta in customer_change_points)
+            )
+        ordinals, deltas = np.array(change_points, dtype=np.float64).reshape(-1, 2).T
+        ordinals = ordinals.astype(np.int64)
+
+        # Change points are stored per customer, in customer order, as sorted
+        # (customer, ordinal) keys with the customer's arr from that day on
+        self.__offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.__offsets[1:])
+        codes = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+        self.__keys = codes * _CUSTOMER_KEY_STRIDE + ordinals
+        self.__customer_arrs = np.array(customer_arrs, dtype=np.float64)
+
+        # Total arr across all customers from each distinct change day on
+        order = np.argsort(ordinals, kind="stable")
+        self.__ordinals, first = np.unique(ordinals[order], return_index=True)
+        last = (np.append(first[1:], len(order)) - 1)[: len(first)]
+        self.__total_arrs = np.cumsum(deltas[order])[last]
+
+    @classmethod
+    def from_saas_data(cls, saas_data: SaasData) -> Self:
+        return cls({id: customer.arr_timeline for id, customer in saas_data.items()})
+
+    def apply(self, amendments: Iterable[ArrAmendment]) -> None:
+        # Replaces the change points of amended customers from the day their arr
+        # changed and patches total arr from the earliest of those days.
+        # Amendments for customers not in the index are ignored.
+        amended: dict[int, list[ArrAmendment]] = {}
+        for amendment in amendments:
+            code = self.__customer_codes.get(amendment.customer_id)
+            if code is not None:
+                amended.setdefault(code, []).append(amendment)
+        if not amended:
+            return
+
+        keys: list[np.ndarray] = []
+        customer_arrs: list[np.ndarray] = []
+        counts = np.diff(self.__offsets)
+        changes: list[tuple[int, float]] = []
+        from_ordinal = math.inf
+        prev_hi = 0
+        for code in sorted(amended):
+            lo, hi = int(self.__offsets[code]), int(self.__offsets[code + 1])
+            base = code * _CUSTOMER_KEY_STRIDE
+            customer_ordinals = (self.__keys[lo:hi] - base).tolist()
+            arrs = self.__customer_arrs[lo:hi].tolist()
+            for amendment in amended[code]:
+                amended_ordinal = amendment.from_date.toordinal()
+                from_ordinal = min(from_ordinal, amended_ordinal)
+                cut = bisect_left(customer_ordinals, amended_ordinal)
+                new_deltas = (delta for _, delta in amendment.new_change_points)
+                initial = arrs[cut - 1] if cut else 0.0
+                customer_ordinals[cut:] = [o for o, _ in amendment.new_change_points]
+                arrs[cut:] = list(accumulate(new_deltas, initial=initial))[1:]
+                changes.extend((o, -delta) for o, delta in amendment.old_change_points)
+                changes.extend(amendment.new_change_points)
+            keys.append(self.__keys[prev_hi:lo])
+            keys.append(base + np.array(customer_ordinals, dtype=np.int64))
+            customer_arrs.append(self.__customer_arrs[prev_hi:lo])
+            customer_arrs.append(np.array(arrs, dtype=np.float64))
+            counts[code] = len(customer_ordinals)
+            prev_hi = hi
+        keys.append(self.__keys[prev_hi:])
+        customer_arrs.append(self.__customer_arrs[prev_hi:])
+        self.__keys = np.concatenate(keys)
+        self.__customer_arrs = np.concatenate(customer_arrs)
+        np.cumsum(counts, out=self.__offsets[1:])
+
+        # Total arr before the earliest change is kept and the rest is rebuilt
+        # from its existing steps and the customers' changes
+        position = int(np.searchsorted(self.__ordinals, from_ordinal))
+        prev_total = float(self.__total_arrs[position - 1]) if position else 0.0
+        change_ordinals, change_deltas = np.array(changes).reshape(-1, 2).T
+        ordinals = np.concatenate(
+            (self.__ordinals[position:], change_ordinals.astype(np.int64))
+        )
+        deltas = np.concatenate(
+            (np.diff(self.__total_arrs[position:], prepend=prev_total), change_deltas)
+        )
+        tail_ordinals, inverse = np.unique(ordinals, return_inverse=True)
+        tail_totals = prev_total + np.cumsum(np.bincount(inverse, weights=deltas))
+        self.__ordinals = np.concatenate((self.__ordinals[:position], tail_ordinals))
+        self.__total_arrs = np.concatenate((self.__total_arrs[:position], tail_totals))
+
+    @property
+    def customer_ids(self) -> list[str]:
+        return self.__customer_ids
+
+    def customer_arr(self, d: date) -> np.ndarray:
+        # arr of every customer on d, in customer_ids order
+        codes = np.arange(len(self.__customer_ids), dtype=np.int64)
+        queries = codes * _CUSTOMER_KEY_STRIDE + d.toordinal()
+        positions = np.searchsorted(self.__keys, queries, side="right") - 1
+        has_changed = positions >= self.__offsets[:-1]
+        return np.where(has_changed, self.__customer_arrs[positions], 0.0)
+
+    def total_arr(self, d: date) -> float:
+        position = int(np.searchsorted(self.__ordinals, d.toordinal(), side="right"))
+        return float(self.__total_arrs[position - 1]) if position else 0.0
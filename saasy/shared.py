@@ -0,0 +1,218 @@
+import os
+import tempfile
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
+from typing import Self
+
+import numpy as np
+
+from saasy.cache import CACHED_ARR_EVENT_DTYPE, arr_event_columns, restore_arr
+from saasy.models import (
+    ARR_INTERVAL_DTYPE,
+    ContractTable,
+    Customer,
+    CustomerDiagnostic,
+    SaasData,
+    compute_arr,
+)
+
+# Column offsets in the file are aligned for the widest record
+_ALIGNMENT = 64
+
+
+def _layout(
+    customer_count: int, contract_count: int
+) -> tuple[dict[str, tuple[np.dtype, int, int]], int]:
+    # (dtype, length, byte offset) by column and the total size. Contracts are
+    # grouped by customer. A customer has at most two arr events per contract
+    # and one more interval than arr events, so its outputs start at twice its
+    # contract offset, plus its index for intervals.
+    columns = (
+        ("customer_offsets", np.dtype(np.int64), customer_count + 1),
+        ("start_ordinals", np.dtype(np.int32), contract_count),
+        ("end_ordinals", np.dtype(np.int32), contract_count),
+        ("tcv", np.dtype(np.float64), contract_count),
+        ("event_counts", np.dtype(np.int32), customer_count),
+        ("events", CACHED_ARR_EVENT_DTYPE, 2 * contract_count),
+        ("interval_counts", np.dtype(np.int32), customer_count),
+        ("intervals", ARR_INTERVAL_DTYPE, 2 * contract_count + customer_count),
+    )
+    layout = {}
+    offset = 0
+    for name, dtype, length in columns:
+        layout[name] = (dtype, length, offset)
+        offset += -(-dtype.itemsize * length // _ALIGNMENT) * _ALIGNMENT
+    return layout, offset
+
+
+class SharedContractStore:
+    # Columnar contracts grouped by customer and preallocated arr outputs in one
+    # memory mapped file, which worker processes attach to by path instead of
+    # receiving pickled contracts
+
+    __slots__ = ("path", "customer_count", "contract_count", "__columns")
+
+    def __init__(self, path: str, customer_count: int, contract_count: int) -> None:
+        self.path = path
+        self.customer_count = customer_count
+        self.contract_count = contract_count
+        layout, _ = _layout(customer_count, contract_count)
+        self.__columns: dict[str, np.ndarray] = {
+            name: np.memmap(path, dtype, "r+", offset, shape=(length,))
+            for name, (dtype, length, offset) in layout.items()
+        }
+
+    @classmethod
+    def from_customers(
+        cls, customers: Sequence[Customer], directory: str | os.PathLike | None = None
+    ) -> Self:
+        table = ContractTable.from_contracts(
+            contract for customer in customers for contract in customer.contracts
+        )
+        _, size = _layout(len(customers), len(table))
+        fd, path = tempfile.mkstemp(prefix="saasy-", suffix=".contracts", dir=directory)
+        with os.fdopen(fd, "wb") as f:
+            f.truncate(size)
+
+        store = cls(path, len(customers), len(table))
+        store["customer_offsets"][0] = 0
+        np.cumsum(
+            [len(c.contracts) for c in customers], out=store["customer_offsets"][1:]
+        )
+        store["start_ordinals"][:] = table.start_ordinals
+        store["end_ordinals"][:] = table.end_ordinals
+        store["tcv"][:] = table.tcv
+        return store
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+        self.unlink()
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.__columns[column]
+
+    def close(self) -> None:
+        self.__columns = {}
+
+    def unlink(self) -> None:
+        os.remove(self.path)
+
+    def compute(self, start: int, stop: int) -> None:
+        # Writes arr for customers start to stop into the output columns. A
+        # customer whose arr cannot be computed gets an event count of -1.
+        offsets = self["customer_offsets"]
+        event_counts = self["event_counts"]
+        interval_counts = self["interval_counts"]
+        events = self["events"]
+        intervals = self["intervals"]
+        for customer in range(start, stop):
+            first, last = int(offsets[customer]), int(offsets[customer + 1])
+            table = ContractTable(
+                [""],
+                np.zeros(last - first, dtype=np.int32),
+                self["start_ordinals"][first:last],
+                self["end_ordinals"][first:last],
+                self["tcv"][first:last],
+            )
+            try:
+                arr_events, arr_timeline = compute_arr(table)
+            except (ValueError, RuntimeError):
+                event_counts[customer] = -1
+                continue
+
+            events[2 * first : 2 * first + len(arr_events)] = arr_event_columns(
+                arr_events
+            )
+            event_counts[customer] = len(arr_events)
+
+            interval_start = 2 * first + customer
+            interval_stop = interval_start + len(arr_timeline)
+            intervals[interval_start:interval_stop] = arr_timeline.to_array()
+            interval_counts[customer] = len(arr_timeline)
+
+
+def _compute_range(
+    path: str, customer_count: int, contract_count: int, start: int, stop: int
+) -> None:
+    store = SharedContractStore(path, customer_count, contract_count)
+    store.compute(start, stop)
+    store.close()
+
+
+def compute_shared(
+    saas_data: SaasData,
+    max_workers: int | None = None,
+    chunksize: int | None = None,
+    directory: str | os.PathLike | None = None,
+) -> list[CustomerDiagnostic]:
+    # Computes arr for uncomputed customers in worker processes that read
+    # contracts from and write results to a shared memory mapped file. Customers
+    # are restored from the results when first used. Like compute_isolated,
+    # those that failed are left uncomputed and reported.
+    customers = [c for c in saas_data.values() if not c.is_computed]
+    if not customers:
+        return []
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(customers))
+    if chunksize is None:
+        # A few ranges of customers per worker
+        chunksize = max(1, -(-len(customers) // (max_workers * 4)))
+
+    with SharedContractStore.from_customers(customers, directory) as store:
+        starts = range(0, len(customers), chunksize)
+        stops = [min(start + chunksize, len(customers)) for start in starts]
+        if max_workers == 1:
+            store.compute(0, len(customers))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                ranges = executor.map(
+                    _compute_range,
+                    repeat(store.path),
+                    repeat(store.customer_count),
+                    repeat(store.contract_count),
+                    starts,
+                    stops,
+                )
+                list(ranges)
+
+        # Copied out as the file is removed once the store is closed
+        offsets = store["customer_offsets"].tolist()
+        event_counts = store["event_counts"].tolist()
+        interval_counts = store["interval_counts"].tolist()
+        events = np.array(store["events"])
+        intervals = np.array(store["intervals"])
+
+    diagnostics = []
+    for index, customer in enumerate(customers):
+        if event_counts[index] < 0:
+            diagnostic = _diagnose(customer)
+            if diagnostic is not None:
+                diagnostics.append(diagnostic)
+            continue
+        event_start = 2 * offsets[index]
+        interval_start = event_start + index
+        customer.set_arr_loader(
+            partial(
+                restore_arr,
+                customer.contracts,
+                events[event_start : event_start + event_counts[index]],
+                intervals[interval_start : interval_start + interval_counts[index]],
+            )
+        )
+    return diagnostics
+
+
+def _diagnose(customer: Customer) -> CustomerDiagnostic | None:
+    # Workers only flag failed customers, so the error is reproduced from the
+    # customer's own contracts. Failures are rare enough for this to be cheap.
+    try:
+        customer.set_arr(*compute_arr(customer.contracts))
+    except (ValueError, RuntimeError) as e:
+        return CustomerDiagnostic.from_exception(customer.id, e)
+    return None
@@ -0,0 +1,207 @@
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Iterator, Sequence, Sized
+from datetime import date
+from functools import partial
+from typing import overload
+
+import numpy as np
+
+from saasy.cache import CACHED_ARR_EVENT_DTYPE, arr_event_columns, restore_arr
+from saasy.models import ARR_INTERVAL_DTYPE, Contract, ContractTable, SaasData
+
+SNAPSHOT_FORMAT = "saasy-snapshot"
+SNAPSHOT_VERSION = 1
+
+_MANIFEST = "manifest.json"
+_COLUMNS = (
+    "customer_ids",
+    "customer_id_offsets",
+    "contract_offsets",
+    "start_ordinals",
+    "end_ordinals",
+    "tcv",
+    "event_offsets",
+    "events",
+    "interval_offsets",
+    "intervals",
+)
+
+
+def save_snapshot(saas_data: SaasData, path: str | os.PathLike) -> None:
+    # Writes customers, contracts and any computed arr as a directory of .npy
+    # columns with a versioned manifest. Customers that are not computed are
+    # saved with only their contracts.
+    customers = list(saas_data.values())
+    ids = [customer.id.encode() for customer in customers]
+    table = ContractTable.from_contracts(
+        contract for customer in customers for contract in customer.contracts
+    )
+    no_events = np.empty(0, dtype=CACHED_ARR_EVENT_DTYPE)
+    no_intervals = np.empty(0, dtype=ARR_INTERVAL_DTYPE)
+    events = [no_events]
+    intervals = [no_intervals]
+    for customer in customers:
+        if customer.is_computed:
+            events.append(arr_event_columns(customer.arr_events))
+            intervals.append(customer.arr_timeline.to_array())
+        else:
+            events.append(no_events)
+            intervals.append(no_intervals)
+
+    columns = {
+        "customer_ids": np.frombuffer(b"".join(ids), dtype=np.uint8),
+        "customer_id_offsets": _offsets(ids),
+        "contract_offsets": _offsets([c.contracts for c in customers]),
+        "start_ordinals": table.start_ordinals,
+        "end_ordinals": table.end_ordinals,
+        "tcv": table.tcv,
+        "event_offsets": _offsets(events[1:]),
+        "events": np.concatenate(events),
+        "interval_offsets": _offsets(intervals[1:]),
+        "intervals": np.concatenate(intervals),
+    }
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "customers": len(customers),
+        "contracts": len(table),
+    }
+
+    # Written next to path and renamed so a partial snapshot is never loaded
+    path = os.fspath(path)
+    temp_path = tempfile.mkdtemp(
+        prefix=".snapshot-", dir=os.path.dirname(os.path.abspath(path))
+    )
+    try:
+        for column, values in columns.items():
+            np.save(os.path.join(temp_path, f"{column}.npy"), values)
+        with open(os.path.join(temp_path, _MANIFEST), "w") as f:
+            json.dump(manifest, f)
+        os.rename(temp_path, path)
+    except BaseException:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+
+
+def load_snapshot(
+    path: str | os.PathLike,
+    max_computed_customers: int | None = None,
+    max_computed_bytes: int | None = None,
+) -> SaasData:
+    # Columns are memory mapped and each customer's contracts and arr are only
+    # materialized when first used
+    with open(os.path.join(path, _MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Not a saasy snapshot: {path}")
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {manifest.get('version')}")
+    columns = {
+        column: np.asarray(np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r"))
+        for column in _COLUMNS
+    }
+
+    ids = columns["customer_ids"].tobytes()
+    id_offsets = columns["customer_id_offsets"].tolist()
+    contract_offsets = columns["contract_offsets"].tolist()
+    event_offsets = columns["event_offsets"].tolist()
+    interval_offsets = columns["interval_offsets"].tolist()
+    contract_columns = [
+        columns["start_ordinals"],
+        columns["end_ordinals"],
+        columns["tcv"],
+    ]
+    events = columns["events"]
+    intervals = columns["intervals"]
+
+    saas_data = SaasData(
+        max_computed_customers=max_computed_customers,
+        max_computed_bytes=max_computed_bytes,
+    )
+    for index in range(manifest["customers"]):
+        customer_id = ids[id_offsets[index] : id_offsets[index + 1]].decode()
+        # Each customer only holds views of its own rows
+        contract_start, contract_stop = contract_offsets[index : index + 2]
+        start_ordinals, end_ordinals, tcv = (
+            column[contract_start:contract_stop] for column in contract_columns
+        )
+        contracts = _ColumnContracts(customer_id, start_ordinals, end_ordinals, tcv)
+        customer = saas_data.add_customer(customer_id, contracts)
+        event_start, event_stop = event_offsets[index], event_offsets[index + 1]
+        if event_start == event_stop:
+            continue
+        interval_start = interval_offsets[index]
+        interval_stop = interval_offsets[index + 1]
+        customer.set_arr_loader(
+            partial(
+                restore_arr,
+                contracts,
+                events[event_start:event_stop],
+                intervals[interval_start:interval_stop],
+            )
+        )
+    return saas_data
+
+
+class _ColumnContracts(Sequence[Contract]):
+    # A customer's rows of the snapshot columns, which are only turned into
+    # contracts when first accessed. Pickles as the contracts, so sending a
+    # customer to a worker does not copy the columns.
+
+    __slots__ = ("__customer_id", "__columns", "__contracts")
+
+    def __init__(
+        self,
+        customer_id: str,
+        start_ordinals: np.ndarray,
+        end_ordinals: np.ndarray,
+        tcv: np.ndarray,
+    ) -> None:
+        self.__customer_id = customer_id
+        self.__columns = (start_ordinals, end_ordinals, tcv)
+        self.__contracts: list[Contract] | None = None
+
+    @overload
+    def __getitem__(self, index: int) -> Contract:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Contract]:
+        ...
+
+    def __getitem__(self, index: int | slice) -> Contract | list[Contract]:
+        return self.__materialize()[index]
+
+    def __iter__(self) -> Iterator[Contract]:
+        return iter(self.__materialize())
+
+    def __len__(self) -> int:
+        return len(self.__columns[2])
+
+    def __reduce__(self) -> tuple[type[list], tuple[list[Contract]]]:
+        return list, (self.__materialize(),)
+
+    def __materialize(self) -> list[Contract]:
+        if self.__contracts is None:
+            start_ordinals, end_ordinals, tcv = (
+                column.tolist() for column in self.__columns
+            )
+            self.__contracts = [
+                Contract(
+                    self.__customer_id,
+                    date.fromordinal(start),
+                    date.fromordinal(end),
+                    value,
+                )
+                for start, end, value in zip(start_ordinals, end_ordinals, tcv)
+            ]
+        return self.__contracts
+
+
+def _offsets(values: Sequence[Sized]) -> np.ndarray:
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in values], out=offsets[1:])
+    return offsets
@@ -0,0 +1,26 @@
+from saasy.models import Contract
+from datetime import date
+from typing import Callable
+import pytest
+
+
+def _create_contracts() -> list[Contract]:
+    return [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "b", date.fromisoformat("2020-03-01"), date.fromisoformat("2021-02-28"), 300
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+        Contract(
+            "c", date.fromisoformat("2021-06-01"), date.fromisoformat("2022-05-31"), 50
+        ),
+    ]
+
+
+@pytest.fixture
+def create_contracts() -> Callable[[], list[Contract]]:
+    return _create_contracts
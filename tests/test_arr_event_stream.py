@@ -4,8 +4,12 @@ from saasy.models import (
     ArrEvent,
     ArrEventType,
     ArrEventStream,
+    ArrIntervalTimeline,
+    ArrStateError,
 )
-from datetime import date
+from datetime import date, timedelta
+import pytest
+import random
 
 
 def test_single_contract():
@@ -262,3 +266,126 @@ def test_early_downsell():
     actual = list(ae_stream)
 
     assert actual == expected
+
+
+def test_extend_in_order():
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+    ]
+    ae_stream = ArrEventStream(ContractEventStream(contracts[:1]))
+    first_changed = ae_stream.add_contracts(contracts[1:])
+
+    assert first_changed == 1
+    assert list(ae_stream) == list(ArrEventStream(ContractEventStream(contracts)))
+
+
+def test_extend_out_of_order():
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2020-07-01"), date.fromisoformat("2020-09-30"), 20
+        ),
+    ]
+    ae_stream = ArrEventStream(ContractEventStream(contracts[:2]))
+    first_changed = ae_stream.add_contracts(contracts[2:])
+
+    assert first_changed == 1
+    assert list(ae_stream) == list(ArrEventStream(ContractEventStream(contracts)))
+
+
+def create_renewal_contracts() -> list[Contract]:
+    return [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2020-12-30"), date.fromisoformat("2021-12-31"), 150
+        ),
+        Contract(
+            "a", date.fromisoformat("2022-01-05"), date.fromisoformat("2022-12-31"), 75
+        ),
+        Contract(
+            "a", date.fromisoformat("2023-06-01"), date.fromisoformat("2023-12-31"), 50
+        ),
+    ]
+
+
+def test_iter_events():
+    ce_stream = ContractEventStream(create_renewal_contracts())
+    arr_events = ArrEventStream.iter_events(iter(ce_stream))
+
+    assert next(arr_events) == ArrEvent(ce_stream[0], ArrEventType.New, 100)
+    assert list(arr_events) == list(ArrEventStream(ce_stream))[1:]
+
+
+def test_iter_events_requires_sorted_events():
+    ce_stream = ContractEventStream(create_renewal_contracts())
+
+    with pytest.raises(ValueError):
+        list(ArrEventStream.iter_events(reversed(list(ce_stream))))
+
+
+def test_add_contracts_matches_rebuild():
+    # Few distinct dates so that contracts often start or end on the same day
+    rng = random.Random(0)
+    compared = 0
+    for _ in range(1000):
+        contracts = []
+        for _ in range(rng.randint(2, 6)):
+            start = date(2020, 1, 1) + timedelta(rng.choice([0, 31, 60, 365, 370]))
+            end = start + timedelta(rng.choice([90, 364, 365]))
+            contracts.append(Contract("a", start, end, rng.choice([100, 200, 300])))
+        split = rng.randint(1, len(contracts) - 1)
+        try:
+            expected = ArrEventStream(ContractEventStream(contracts))
+            ae_stream = ArrEventStream(ContractEventStream(contracts[:split]))
+            timeline = ArrIntervalTimeline(ae_stream)
+            for contract in contracts[split:]:
+                timeline.update(ae_stream, ae_stream.add_contracts([contract]))
+        except ArrStateError:
+            continue
+        assert list(ae_stream) == list(expected)
+        assert list(timeline) == list(ArrIntervalTimeline(expected))
+        compared += 1
+    assert compared > 500
+
+
+def test_remove_contracts():
+    contracts = create_renewal_contracts()
+    ae_stream = ArrEventStream(ContractEventStream(contracts))
+    first_changed = ae_stream.remove_contracts([contracts[2]])
+
+    expected = ArrEventStream(ContractEventStream(contracts[:2] + contracts[3:]))
+    assert first_changed == 3
+    assert list(ae_stream) == list(expected)
+
+
+def test_replace_contracts():
+    contracts = create_renewal_contracts()
+    amended = Contract(
+        "a", date.fromisoformat("2020-12-30"), date.fromisoformat("2021-12-31"), 200
+    )
+    ae_stream = ArrEventStream(ContractEventStream(contracts))
+    ae_stream.replace_contracts([contracts[1]], [amended])
+
+    expected = [contracts[0], contracts[2], contracts[3], amended]
+    assert list(ae_stream) == list(ArrEventStream(ContractEventStream(expected)))
+
+
+def test_remove_missing_contract():
+    contracts = create_renewal_contracts()
+    ae_stream = ArrEventStream(ContractEventStream(contracts[:2]))
+
+    with pytest.raises(ValueError):
+        ae_stream.remove_contracts([contracts[2]])
+    assert list(ae_stream) == list(ArrEventStream(ContractEventStream(contracts[:2])))
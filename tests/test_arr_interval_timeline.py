@@ -5,8 +5,11 @@ from saasy.models import (
     ArrEventStream,
     ArrInterval,
     ArrIntervalTimeline,
+    ARR_INTERVAL_DTYPE,
+    series_dates,
 )
 from datetime import date
+import math
 import portion as P
 
 
@@ -126,3 +129,344 @@ def test_single_downsell():
     actual = list(create_arr_interval_timeline(contracts))
 
     assert actual == expected
+
+
+def test_getitem():
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+    ]
+    timeline = create_arr_interval_timeline(contracts)
+
+    assert timeline[date.fromisoformat("2019-12-31")].arr == 0
+    assert timeline[date.fromisoformat("2020-01-01")].arr == 100
+    assert timeline[date.fromisoformat("2020-12-31")].arr == 100
+    assert timeline[date.fromisoformat("2021-01-01")].arr == 150
+    assert timeline[date.fromisoformat("2021-12-31")].arr == 150
+    assert timeline[date.fromisoformat("2022-01-01")].arr == 0
+
+
+def test_arr_at_unsorted():
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 75
+        ),
+    ]
+    timeline = create_arr_interval_timeline(contracts)
+    dates = [
+        date.fromisoformat("2021-06-01"),
+        date.fromisoformat("2019-01-01"),
+        date.fromisoformat("2020-06-01"),
+        date.fromisoformat("2030-01-01"),
+        date.fromisoformat("2021-01-01"),
+    ]
+
+    assert timeline.arr_at(dates) == [75, 0, 100, 0, 75]
+    assert timeline.arr_at(dates) == [timeline[d].arr for d in dates]
+
+
+def test_update_after_extend():
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+        Contract(
+            "a", date.fromisoformat("2020-07-01"), date.fromisoformat("2020-09-30"), 20
+        ),
+    ]
+    ae_stream = ArrEventStream(ContractEventStream(contracts[:1]))
+    timeline = ArrIntervalTimeline(ae_stream)
+    for contract in contracts[1:]:
+        timeline.update(ae_stream, ae_stream.add_contracts([contract]))
+
+    assert list(timeline) == list(create_arr_interval_timeline(contracts))
+    assert timeline[date.fromisoformat("2020-08-01")].arr == 200
+
+
+def test_update_after_removing_renewal():
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-05"), date.fromisoformat("2021-12-31"), 100
+        ),
+    ]
+    ae_stream = ArrEventStream(ContractEventStream(contracts))
+    timeline = ArrIntervalTimeline(ae_stream)
+    timeline.update(ae_stream, ae_stream.remove_contracts(contracts[1:]))
+
+    assert list(timeline) == list(create_arr_interval_timeline(contracts[:1]))
+
+
+def test_change_points_from_start():
+    timeline = create_expansion_timeline()
+
+    assert list(timeline.change_points()) == [
+        (date.fromisoformat("2020-01-01").toordinal(), 100),
+        (date.fromisoformat("2021-01-01").toordinal(), 50),
+        (date.fromisoformat("2022-01-01").toordinal(), -150),
+    ]
+    assert list(timeline.change_points(date.fromisoformat("2020-01-02"))) == [
+        (date.fromisoformat("2021-01-01").toordinal(), 50),
+        (date.fromisoformat("2022-01-01").toordinal(), -150),
+    ]
+
+
+def test_daily_series():
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+    ]
+    timeline = create_arr_interval_timeline(contracts)
+    start, end = date.fromisoformat("2019-12-01"), date.fromisoformat("2022-02-01")
+    dates = [date.fromordinal(o) for o in range(start.toordinal(), end.toordinal() + 1)]
+
+    series = timeline.to_series(start, end)
+
+    assert series.tolist() == timeline.arr_at(dates)
+    assert series_dates(start, end).tolist() == dates
+
+
+def test_month_end_series():
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2020-01-15"), date.fromisoformat("2020-12-31"), 100
+        ),
+    ]
+    timeline = create_arr_interval_timeline(contracts)
+
+    series = timeline.to_series(
+        date.fromisoformat("2019-11-15"), date.fromisoformat("2021-02-15"), freq="M"
+    )
+
+    assert series.tolist() == [0, 0] + [100] * 12 + [0]
+
+
+def create_expansion_timeline() -> ArrIntervalTimeline:
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+    ]
+    return create_arr_interval_timeline(contracts)
+
+
+def test_slice():
+    timeline = create_expansion_timeline()
+    intervals = list(timeline)
+
+    assert (
+        timeline.slice(
+            date.fromisoformat("2020-06-01"), date.fromisoformat("2020-12-31")
+        )
+        == intervals[1:2]
+    )
+    assert (
+        timeline.slice(
+            date.fromisoformat("2020-06-01"), date.fromisoformat("2021-01-01")
+        )
+        == intervals[1:3]
+    )
+    assert (
+        timeline.slice(
+            date.fromisoformat("2019-06-01"), date.fromisoformat("2030-01-01")
+        )
+        == intervals
+    )
+    assert (
+        timeline.slice(
+            date.fromisoformat("2022-01-01"), date.fromisoformat("2022-01-01")
+        )
+        == intervals[3:]
+    )
+    assert (
+        timeline.slice(
+            date.fromisoformat("2020-06-01"), date.fromisoformat("2020-05-01")
+        )
+        == []
+    )
+
+
+def test_integrate():
+    timeline = create_expansion_timeline()
+    start, end = date.fromisoformat("2019-12-01"), date.fromisoformat("2022-02-01")
+    dates = [date.fromordinal(o) for o in range(start.toordinal(), end.toordinal() + 1)]
+    arrs = timeline.arr_at(dates)
+
+    for i, j in [(0, len(dates) - 1), (40, 41), (45, 400), (390, 420), (10, 20)]:
+        assert timeline.integrate(dates[i], dates[j]) == sum(arrs[i : j + 1])
+    assert timeline.integrate(end, start) == 0
+
+
+def test_iter_intervals():
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2022-01-01"), date.fromisoformat("2022-12-31"), 150
+        ),
+        Contract(
+            "a", date.fromisoformat("2023-06-01"), date.fromisoformat("2023-12-31"), 50
+        ),
+    ]
+    contract_events = iter(ContractEventStream(contracts))
+    intervals = ArrIntervalTimeline.iter_intervals(
+        ArrEventStream.iter_events(contract_events)
+    )
+
+    assert list(intervals) == list(create_arr_interval_timeline(contracts))
+
+
+def create_churn_timeline() -> ArrIntervalTimeline:
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-06-30"), 60
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-03-01"), date.fromisoformat("2021-05-31"), 40
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-09-01"), date.fromisoformat("2021-12-31"), 10
+        ),
+    ]
+    return create_arr_interval_timeline(contracts)
+
+
+def test_open_and_closed_bounds():
+    timeline = create_churn_timeline()
+    intervals = list(timeline)
+    start, end = date.fromisoformat("2019-12-01"), date.fromisoformat("2021-10-01")
+
+    # Every day is in exactly one interval, the one returned by __getitem__
+    for ordinal in range(start.toordinal(), end.toordinal() + 1):
+        d = date.fromordinal(ordinal)
+        [interval] = [interval for interval in intervals if d in interval]
+        assert timeline[d] == interval
+    # Intervals between arr events are closed open, as the churn interval
+    # starts on the last day of the churned contract
+    churn = timeline[date.fromisoformat("2021-07-01")]
+    assert churn.date_interval == P.closedopen(
+        date.fromisoformat("2021-06-30"), date.fromisoformat("2021-09-01")
+    )
+    assert churn.arr == 0
+    # while the last interval before the final churn is fully closed
+    assert timeline[date.fromisoformat("2021-09-01")].date_interval == P.closed(
+        date.fromisoformat("2021-09-01"), date.fromisoformat("2021-12-31")
+    )
+    assert timeline[date.fromisoformat("2021-03-01")].date_interval == P.closedopen(
+        date.fromisoformat("2021-03-01"), date.fromisoformat("2021-05-31")
+    )
+
+
+def test_infinite_bounds():
+    timeline = create_churn_timeline()
+    first, *_, last = timeline
+    intervals = timeline.to_array()
+
+    assert first.date_interval.lower == -P.inf
+    assert first.date_interval.left == P.OPEN
+    assert last.date_interval.upper == P.inf
+    assert last.date_interval.right == P.OPEN
+    assert intervals["lower"][0] == -math.inf
+    assert intervals["upper"][-1] == math.inf
+    assert timeline[date.min] == first
+    assert timeline[date.max] == last
+    assert timeline.arr_at([date.min, date.max]) == [0, 0]
+    assert timeline.integrate(date.min, date.max) == timeline.integrate(
+        date.fromisoformat("2020-01-01"), date.fromisoformat("2021-12-31")
+    )
+    assert timeline.slice(date.min, date.fromisoformat("2019-12-31")) == [first]
+    assert timeline.slice(date.fromisoformat("2022-01-01"), date.max) == [last]
+
+
+def test_views_invalidated_after_update():
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-07-01"), date.fromisoformat("2021-12-31"), 20
+        ),
+    ]
+    ae_stream = ArrEventStream(ContractEventStream(contracts[:2]))
+    timeline = ArrIntervalTimeline(ae_stream)
+    before = list(timeline)
+    assert timeline[date.fromisoformat("2021-08-01")].arr == 150
+
+    timeline.update(ae_stream, ae_stream.add_contracts(contracts[2:]))
+    after = list(timeline)
+
+    assert after == list(create_arr_interval_timeline(contracts))
+    assert timeline[date.fromisoformat("2021-08-01")].arr == after[3].arr
+    assert after[3].arr > 150
+    # Views are kept up to the last interval before the replayed arr events,
+    # which a replayed renewal could have extended
+    assert after[0] is before[0]
+    assert after[1] == before[1]
+    assert after[2] is not before[2]
+    assert after[2].date_interval == P.closedopen(
+        date.fromisoformat("2021-01-01"), date.fromisoformat("2021-07-01")
+    )
+    assert before[2].date_interval == P.closed(
+        date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31")
+    )
+
+
+def test_array_round_trip():
+    timeline = create_churn_timeline()
+    intervals = timeline.to_array()
+
+    restored = ArrIntervalTimeline.from_array(intervals)
+
+    assert list(restored) == list(timeline)
+    assert restored.to_array().tobytes() == intervals.tobytes()
+    assert restored.to_array().dtype == ARR_INTERVAL_DTYPE
+    assert list(restored.change_points()) == list(timeline.change_points())
+    for d in [date.min, date.fromisoformat("2021-07-01"), date.max]:
+        assert restored[d] == timeline[d]
+
+
+def test_update_after_from_array():
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+    ]
+    ae_stream = ArrEventStream(ContractEventStream(contracts[:1]))
+    restored = ArrIntervalTimeline.from_array(ArrIntervalTimeline(ae_stream).to_array())
+
+    # Without checkpoints the restored timeline is rebuilt from the whole stream
+    restored.update(ae_stream, ae_stream.add_contracts(contracts[1:]))
+
+    assert list(restored) == list(create_arr_interval_timeline(contracts))
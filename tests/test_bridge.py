@@ -0,0 +1,104 @@
+from saasy.bridge import arr_bridge
+from saasy.models import (
+    Contract,
+    ContractEventStream,
+    ArrEventStream,
+    ArrEventType,
+)
+from datetime import date
+import numpy as np
+import pytest
+
+
+def create_arr_event_streams() -> list[ArrEventStream]:
+    contracts = [
+        [
+            Contract(
+                "a",
+                date.fromisoformat("2020-01-01"),
+                date.fromisoformat("2020-12-31"),
+                100,
+            ),
+            Contract(
+                "a",
+                date.fromisoformat("2021-01-01"),
+                date.fromisoformat("2021-12-31"),
+                150,
+            ),
+        ],
+        [
+            Contract(
+                "b",
+                date.fromisoformat("2020-07-01"),
+                date.fromisoformat("2021-06-30"),
+                50,
+            ),
+        ],
+    ]
+    return [ArrEventStream(ContractEventStream(c)) for c in contracts]
+
+
+def test_yearly_bridge():
+    bridge = arr_bridge(create_arr_event_streams(), period="year")
+
+    assert bridge.periods.tolist() == [
+        date.fromisoformat("2020-01-01"),
+        date.fromisoformat("2021-01-01"),
+    ]
+    assert bridge.opening_arr.tolist() == [0, 150]
+    assert bridge.closing_arr.tolist() == [150, 0]
+    assert bridge.totals[ArrEventType.New].tolist() == [150, 0]
+    assert bridge.counts[ArrEventType.New].tolist() == [2, 0]
+    assert bridge.counts[ArrEventType.Renewal].tolist() == [0, 1]
+    assert bridge.totals[ArrEventType.Expansion].tolist() == [0, 50]
+    assert bridge.totals[ArrEventType.Churn].tolist() == [0, -200]
+    assert bridge.counts[ArrEventType.Churn].tolist() == [0, 2]
+
+
+def test_quarterly_bridge_with_range():
+    bridge = arr_bridge(
+        create_arr_event_streams(),
+        period="quarter",
+        start=date.fromisoformat("2020-07-15"),
+        end=date.fromisoformat("2021-03-31"),
+    )
+
+    assert len(bridge.periods) == 3
+    assert bridge.opening_arr.tolist() == [100, 150, 150]
+    assert bridge.closing_arr.tolist() == [150, 150, 200]
+    assert bridge.totals[ArrEventType.New].tolist() == [50, 0, 0]
+
+
+def test_monthly_closing_matches_opening():
+    bridge = arr_bridge(create_arr_event_streams())
+
+    assert len(bridge.periods) == 24
+    assert np.array_equal(bridge.closing_arr[:-1], bridge.opening_arr[1:])
+
+
+def test_empty_bridge():
+    bridge = arr_bridge([], end=date.fromisoformat("2021-01-31"))
+
+    assert len(bridge.periods) == 0
+    assert len(bridge.closing_arr) == 0
+    assert len(bridge.totals[ArrEventType.New]) == 0
+
+
+def test_empty_bridge_with_range():
+    bridge = arr_bridge(
+        [],
+        start=date.fromisoformat("2020-11-15"),
+        end=date.fromisoformat("2021-01-31"),
+    )
+
+    assert bridge.periods.tolist() == [
+        date.fromisoformat("2020-11-01"),
+        date.fromisoformat("2020-12-01"),
+        date.fromisoformat("2021-01-01"),
+    ]
+    assert bridge.closing_arr.tolist() == [0, 0, 0]
+
+
+def test_invalid_period():
+    with pytest.raises(ValueError):
+        arr_bridge(create_arr_event_streams(), period="week")
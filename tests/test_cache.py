@@ -0,0 +1,207 @@
+from saasy.cache import ArrCache, customer_key
+from saasy.instrumentation import PipelineStats
+from saasy.models import (
+    Contract,
+    ContractEventStream,
+    ArrEventStream,
+    ArrIntervalTimeline,
+    SaasData,
+)
+from datetime import date
+import os
+import pytest
+
+
+def assert_same_arr(actual: SaasData, expected: SaasData):
+    for customer_id, customer in expected.items():
+        assert list(actual[customer_id].arr_events) == list(customer.arr_events)
+        assert list(actual[customer_id].arr_timeline) == list(customer.arr_timeline)
+
+
+def test_customer_key(create_contracts):
+    data = SaasData(create_contracts())
+    other = SaasData(create_contracts())
+
+    assert customer_key(data["a"]) == customer_key(other["a"])
+    assert customer_key(data["a"]) != customer_key(data["b"])
+
+    other["a"].add_contracts(
+        [
+            Contract(
+                "a",
+                date.fromisoformat("2022-01-01"),
+                date.fromisoformat("2022-12-31"),
+                150,
+            )
+        ]
+    )
+    assert customer_key(data["a"]) != customer_key(other["a"])
+
+
+def test_compute_reuses_cached_customers(tmp_path, create_contracts):
+    expected = SaasData(create_contracts())
+    expected.compute(max_workers=1)
+
+    ArrCache(tmp_path).compute(SaasData(create_contracts()), max_workers=1)
+
+    data = SaasData(create_contracts())
+    stats = PipelineStats()
+    cache = ArrCache(tmp_path)
+    cache.compute(data, max_workers=1, stats=stats)
+
+    assert len(cache) == 3
+    assert stats.stages["cache_load"].items == 3
+    assert "contract_event_stream" not in stats.stages
+    assert_same_arr(data, expected)
+
+
+def test_compute_stores_customers_that_do_not_fail(tmp_path, create_contracts):
+    corrupt = [
+        Contract(
+            "d", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "d", date.fromisoformat("2020-06-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "d", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-06-01"), 10
+        ),
+    ]
+    expected = SaasData(create_contracts())
+    expected.compute(max_workers=1)
+
+    data = SaasData(create_contracts() + corrupt)
+    diagnostics = ArrCache(tmp_path).compute(data, max_workers=1)
+
+    assert [d.customer_id for d in diagnostics] == ["d"]
+    assert not data["d"].is_computed
+    assert_same_arr(data, expected)
+
+    stats = PipelineStats()
+    cache = ArrCache(tmp_path)
+    assert cache.compute(SaasData(create_contracts()), max_workers=1, stats=stats) == []
+    assert len(cache) == 3
+    assert stats.stages["cache_load"].items == 3
+
+
+def test_compute_only_changed_customers(tmp_path, create_contracts):
+    ArrCache(tmp_path).compute(SaasData(create_contracts()), max_workers=1)
+
+    contracts = create_contracts()
+    contracts[1] = Contract(
+        "b", date.fromisoformat("2020-03-01"), date.fromisoformat("2021-02-28"), 600
+    )
+    expected = SaasData(contracts)
+    expected.compute(max_workers=1)
+
+    data = SaasData(contracts)
+    stats = PipelineStats()
+    cache = ArrCache(tmp_path)
+    cache.compute(data, max_workers=1, stats=stats)
+
+    assert stats.stages["cache_load"].items == 2
+    assert stats.stages["cache_store"].items == 1
+    assert stats.stages["contract_event_stream"].calls == 1
+    assert len(ArrCache(tmp_path)) == 4
+    assert_same_arr(data, expected)
+
+
+@pytest.fixture
+def create_changed_contracts(create_contracts):
+    def create(tcv: float) -> list[Contract]:
+        contracts = create_contracts()
+        contracts[1] = Contract(
+            "b", date.fromisoformat("2020-03-01"), date.fromisoformat("2021-02-28"), tcv
+        )
+        return contracts
+
+    return create
+
+
+def test_store_same_customers_adds_no_segments(tmp_path, create_contracts):
+    data = SaasData(create_contracts())
+    ArrCache(tmp_path).compute(data, max_workers=1)
+
+    cache = ArrCache(tmp_path)
+    cache.store(data.values())
+    ArrCache(tmp_path).compute(SaasData(create_contracts()), max_workers=1)
+
+    assert cache.segment_count == 1
+    assert len(os.listdir(tmp_path)) == 1
+    assert len(ArrCache(tmp_path)) == 3
+
+
+def test_compact_drops_other_entries(
+    tmp_path, create_contracts, create_changed_contracts
+):
+    ArrCache(tmp_path).compute(SaasData(create_contracts()), max_workers=1)
+    data = SaasData(create_changed_contracts(600))
+    cache = ArrCache(tmp_path)
+    cache.compute(data, max_workers=1)
+    assert cache.segment_count == 2
+    assert len(cache) == 4
+
+    cache.compact(customer_key(c) for c in data.values())
+
+    assert cache.segment_count == 1
+    assert len(cache) == 3
+    assert len(os.listdir(tmp_path)) == 1
+    expected = SaasData(create_changed_contracts(600))
+    expected.compute(max_workers=1)
+    reloaded = SaasData(create_changed_contracts(600))
+    stats = PipelineStats()
+    ArrCache(tmp_path).compute(reloaded, max_workers=1, stats=stats)
+    assert stats.stages["cache_load"].items == 3
+    assert_same_arr(reloaded, expected)
+
+
+def test_segments_merged_past_max_segments(tmp_path, create_changed_contracts):
+    for tcv in [300, 400, 500, 600]:
+        ArrCache(tmp_path, max_segments=2).compute(
+            SaasData(create_changed_contracts(tcv)), max_workers=1
+        )
+
+    cache = ArrCache(tmp_path, max_segments=2)
+    assert cache.segment_count <= 2
+    assert len(os.listdir(tmp_path)) == cache.segment_count
+    assert len(cache) == 6
+    data = SaasData(create_changed_contracts(400))
+    expected = SaasData(create_changed_contracts(400))
+    expected.compute(max_workers=1)
+    assert cache.load(data["b"])
+    assert_same_arr(data, expected)
+
+
+def test_loaded_customer_can_add_contracts(tmp_path, create_contracts):
+    ArrCache(tmp_path).compute(SaasData(create_contracts()), max_workers=1)
+    new_contracts = [
+        Contract(
+            "a", date.fromisoformat("2021-07-01"), date.fromisoformat("2021-09-30"), 20
+        ),
+        Contract(
+            "a", date.fromisoformat("2022-01-01"), date.fromisoformat("2022-12-31"), 200
+        ),
+    ]
+    expected = SaasData(create_contracts() + new_contracts)
+    expected.compute(max_workers=1)
+
+    data = SaasData(create_contracts())
+    ArrCache(tmp_path).compute(data, max_workers=1)
+    data["a"].arr_timeline
+    data.add_contracts(new_contracts)
+
+    assert_same_arr(data, expected)
+
+
+def test_timeline_array_round_trip(create_contracts):
+    contracts = create_contracts()[::2]
+    arr_events = ArrEventStream(ContractEventStream(contracts))
+    timeline = ArrIntervalTimeline(arr_events)
+    restored = ArrIntervalTimeline.from_array(timeline.to_array())
+
+    assert list(restored) == list(timeline)
+    assert restored.integrate(
+        date.fromisoformat("2020-06-01"), date.fromisoformat("2021-06-01")
+    ) == timeline.integrate(
+        date.fromisoformat("2020-06-01"), date.fromisoformat("2021-06-01")
+    )
@@ -0,0 +1,82 @@
+from saasy.cohorts import cohort_analysis
+from saasy.models import Contract, ContractEventStream, ArrEventStream
+from datetime import date
+import numpy as np
+
+
+def create_arr_event_streams() -> list[ArrEventStream]:
+    contracts = [
+        [
+            Contract(
+                "a",
+                date.fromisoformat("2020-01-01"),
+                date.fromisoformat("2020-12-31"),
+                100,
+            ),
+            Contract(
+                "a",
+                date.fromisoformat("2021-01-01"),
+                date.fromisoformat("2021-12-31"),
+                150,
+            ),
+        ],
+        [
+            Contract(
+                "b",
+                date.fromisoformat("2020-01-15"),
+                date.fromisoformat("2020-07-14"),
+                50,
+            ),
+        ],
+        [
+            Contract(
+                "c",
+                date.fromisoformat("2020-05-01"),
+                date.fromisoformat("2021-04-30"),
+                200,
+            ),
+        ],
+    ]
+    return [ArrEventStream(ContractEventStream(c)) for c in contracts]
+
+
+def test_quarterly_cohorts():
+    analysis = cohort_analysis(
+        create_arr_event_streams(),
+        period="quarter",
+        end=date.fromisoformat("2021-12-31"),
+    )
+
+    assert analysis.cohorts.tolist() == [
+        date.fromisoformat("2020-01-01"),
+        date.fromisoformat("2020-04-01"),
+    ]
+    assert len(analysis.periods) == 8
+    assert analysis.customer_counts.tolist() == [2, 1]
+    assert analysis.starting_arr.tolist() == [200, 200]
+    assert analysis.arr.tolist() == [
+        [200, 200, 100, 100, 150, 150, 150, 0],
+        [0, 200, 200, 200, 200, 0, 0, 0],
+    ]
+    assert analysis.retained_arr[0].tolist() == [200, 200, 100, 100, 100, 100, 100, 0]
+    assert analysis.nrr[0].tolist() == [1, 1, 0.5, 0.5, 0.75, 0.75, 0.75, 0]
+    assert analysis.grr[0].tolist() == [1, 1, 0.5, 0.5, 0.5, 0.5, 0.5, 0]
+    assert np.isnan(analysis.nrr[1, 0])
+    assert analysis.grr[1, 1:].tolist() == [1, 1, 1, 1, 0, 0, 0]
+
+
+def test_chunking_does_not_change_results():
+    streams = create_arr_event_streams()
+    expected = cohort_analysis(streams)
+    actual = cohort_analysis(streams, chunk_size=1)
+
+    assert np.array_equal(expected.arr, actual.arr)
+    assert np.array_equal(expected.retained_arr, actual.retained_arr)
+    assert np.array_equal(expected.starting_arr, actual.starting_arr)
+
+
+def test_no_customers():
+    analysis = cohort_analysis([])
+
+    assert len(analysis.cohorts) == 0
+    assert analysis.arr.shape == (0, 0)
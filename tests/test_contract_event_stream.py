@@ -0,0 +1,97 @@
+from saasy.models import (
+    CONTRACT_EVENT_TYPES,
+    Contract,
+    ContractEvent,
+    ContractEventType,
+    ContractEventStream,
+    ContractTable,
+)
+from datetime import date, timedelta
+import random
+import pytest
+
+
+def create_contracts() -> list[Contract]:
+    return [
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2021-01-01"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2020-07-01"), date.fromisoformat("2020-12-31"), 50
+        ),
+    ]
+
+
+def test_matches_sorted_contract_events():
+    contracts = create_contracts()
+    expected = sorted(
+        ContractEvent(c, t)
+        for c in contracts
+        for t in (ContractEventType.Start, ContractEventType.End)
+    )
+
+    ce_stream = ContractEventStream(contracts)
+
+    assert list(ce_stream) == expected
+    assert [ce_stream[i] for i in range(len(ce_stream))] == expected
+
+
+def test_slices():
+    ce_stream = ContractEventStream(create_contracts())
+    contract_events = list(ce_stream)
+
+    assert ce_stream[1:4] == contract_events[1:4]
+    assert ce_stream[::-2] == contract_events[::-2]
+    assert ce_stream[-1] == contract_events[-1]
+    assert ce_stream[10:] == []
+
+
+def test_end_before_start_on_same_day():
+    contracts = create_contracts()
+    ce_stream = ContractEventStream(contracts)
+
+    assert ce_stream[3] == ContractEvent(contracts[1], ContractEventType.End)
+    assert ce_stream[4] == ContractEvent(contracts[0], ContractEventType.Start)
+
+
+def test_packed_events():
+    ce_stream = ContractEventStream(create_contracts())
+    events = ce_stream.events
+
+    assert events["contract"].tolist() == [1, 2, 2, 1, 0, 0]
+    assert events["arr_change"].tolist() == [100, 100, -100, -100, 150, -150]
+
+
+def test_from_contract_table():
+    contracts = create_contracts()
+    table = ContractTable.from_contracts(contracts)
+
+    assert list(ContractEventStream(table)) == list(ContractEventStream(contracts))
+
+
+@pytest.mark.parametrize("count", [3, 200])
+def test_small_and_packed_streams_match(count):
+    # Few days and tcvs so that many events tie
+    rng = random.Random(count)
+    contracts = []
+    for _ in range(count):
+        start = date(2020, 1, 1) + timedelta(days=rng.randrange(40))
+        end = start + timedelta(days=rng.choice([30, 364]))
+        contracts.append(Contract("a", start, end, rng.choice([100, 200])))
+    table = ContractTable.from_contracts(contracts)
+
+    ce_stream = ContractEventStream(contracts)
+    packed = ContractEventStream(table)
+
+    assert [(id(ce.contract), ce.event_type) for ce in ce_stream] == [
+        (id(contracts[c]), t)
+        for c, t in zip(
+            packed.events["contract"].tolist(),
+            (CONTRACT_EVENT_TYPES[t] for t in packed.events["event_type"].tolist()),
+        )
+    ]
+    assert ce_stream.events.tobytes() == packed.events.tobytes()
+    assert len(ce_stream) == len(packed) == 2 * count
@@ -0,0 +1,75 @@
+from saasy.models import Contract, ContractError, ContractTable
+from datetime import date
+import numpy as np
+
+
+def create_contracts() -> list[Contract]:
+    return [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "b", date.fromisoformat("2020-03-01"), date.fromisoformat("2022-02-28"), 300
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+    ]
+
+
+def test_round_trip():
+    contracts = create_contracts()
+    table = ContractTable.from_contracts(contracts)
+
+    assert len(table) == 3
+    assert table.to_contracts() == contracts
+    assert list(table) == contracts
+    assert table[1:] == contracts[1:]
+    assert table[::-1] == contracts[::-1]
+
+
+def test_customer_ids_interned():
+    table = ContractTable.from_contracts(create_contracts())
+
+    assert table.customer_ids == ["a", "b"]
+    assert table.customer_codes.tolist() == [0, 1, 0]
+
+
+def test_acv_matches_contracts():
+    contracts = create_contracts()
+    table = ContractTable.from_contracts(contracts)
+
+    assert table.len_years.tolist() == [c.len_years() for c in contracts]
+    assert table.acv.tolist() == [c.acv for c in contracts]
+
+
+def test_from_datetime64_columns():
+    table = ContractTable.from_columns(
+        ["a"],
+        np.array(["2020-01-01"], dtype="datetime64[D]"),
+        np.array(["2020-12-31"], dtype="datetime64[D]"),
+        np.array([100.0]),
+    )
+
+    assert table.to_contracts() == create_contracts()[:1]
+
+
+def test_contract_table_validate():
+    table = ContractTable.from_contracts(
+        [
+            Contract(
+                "a",
+                date.fromisoformat("2021-01-01"),
+                date.fromisoformat("2021-12-31"),
+                100,
+            ),
+            Contract(
+                "a",
+                date.fromisoformat("2021-01-01"),
+                date.fromisoformat("2020-01-01"),
+                -100,
+            ),
+        ]
+    )
+
+    assert table.validate().tolist() == [0, ContractError.EndBeforeStart.value]
@@ -0,0 +1,18 @@
+from saasy.models import within_days, yearfrac
+from datetime import date
+
+
+def test_within_days():
+    a = date.fromisoformat("2020-12-31")
+
+    assert within_days(a, date.fromisoformat("2021-01-10"), 10)
+    assert within_days(date.fromisoformat("2021-01-10"), a, 10)
+    assert not within_days(a, date.fromisoformat("2021-01-11"), 10)
+
+
+def test_yearfrac():
+    a = date.fromisoformat("2020-01-01")
+
+    assert yearfrac(a, date.fromisoformat("2020-12-31")) == 1.0
+    assert yearfrac(date.fromisoformat("2020-12-31"), a) == 1.0
+    assert yearfrac(date.fromisoformat("2020-12-31"), a, absolute=False) == -1.0
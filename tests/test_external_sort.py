@@ -0,0 +1,149 @@
+from saasy.external_sort import ExternalContractEventSort, _contract_events
+from saasy.models import (
+    Contract,
+    ContractEventStream,
+    ArrEventStream,
+    ArrIntervalTimeline,
+)
+from datetime import date
+from itertools import groupby
+from operator import itemgetter
+import os
+import pytest
+
+
+def create_contracts() -> list[Contract]:
+    return [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "b", date.fromisoformat("2020-03-01"), date.fromisoformat("2021-02-28"), 300
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+        Contract(
+            "c", date.fromisoformat("2021-06-01"), date.fromisoformat("2022-05-31"), 50
+        ),
+        Contract(
+            "a", date.fromisoformat("2020-12-31"), date.fromisoformat("2021-06-30"), 20
+        ),
+        Contract(
+            "b", date.fromisoformat("2021-03-01"), date.fromisoformat("2022-02-28"), 300
+        ),
+    ]
+
+
+def customer_contracts(customer_id: str) -> list[Contract]:
+    return [c for c in create_contracts() if c.customer_id == customer_id]
+
+
+@pytest.mark.parametrize("run_size", [1, 3, 100])
+def test_iter_customer_events(run_size):
+    with ExternalContractEventSort(run_size) as sort:
+        for contract in create_contracts():
+            sort.add_contracts([contract])
+        if run_size == 1:
+            assert sort.run_count == len(create_contracts())
+
+        customer_events = [
+            (id, list(events)) for id, events in sort.iter_customer_events()
+        ]
+
+    assert [id for id, _ in customer_events] == ["a", "b", "c"]
+    for id, events in customer_events:
+        assert events == list(ContractEventStream(customer_contracts(id)))
+
+
+def test_end_before_start():
+    with ExternalContractEventSort(run_size=2) as sort:
+        sort.add_contracts(create_contracts()[:1])
+        sort.add_contracts(create_contracts()[4:5])
+        events = list(next(sort.iter_customer_events())[1])
+
+    assert [(ce.event_date, ce.event_type.name) for ce in events] == [
+        (date.fromisoformat("2020-01-01"), "Start"),
+        (date.fromisoformat("2020-12-31"), "End"),
+        (date.fromisoformat("2020-12-31"), "Start"),
+        (date.fromisoformat("2021-06-30"), "End"),
+    ]
+
+
+def test_one_day_contract_shares_contract():
+    contract = Contract(
+        "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-01-01"), 100
+    )
+    with ExternalContractEventSort() as sort:
+        sort.add_contracts([contract, contract])
+        events = list(next(sort.iter_customer_events())[1])
+
+    assert [ce.event_type.name for ce in events] == ["End", "End", "Start", "Start"]
+    assert events[0].contract is events[2].contract
+    assert events[1].contract is events[3].contract
+    assert events[0].contract is not events[1].contract
+
+
+def test_contract_events_only_hold_open_contracts():
+    contracts = [
+        Contract("a", date(2000 + year, 1, 1), date(2000 + year, 12, 31), 100)
+        for year in range(20)
+    ]
+    with ExternalContractEventSort(run_size=8) as sort:
+        sort.add_contracts(contracts)
+        [(_, records)] = [
+            (code, list(records)) for code, records in groupby(sort, itemgetter(0))
+        ]
+    contract_events = _contract_events("a", records)
+
+    sizes = []
+    for ce in contract_events:
+        sizes.append(len(contract_events.gi_frame.f_locals["contracts"]))
+    assert max(sizes) == 1
+    assert sizes[-1] == 0
+
+
+def test_iter_customer_arr():
+    with ExternalContractEventSort(run_size=4) as sort:
+        sort.add_contracts(create_contracts())
+        sort.add_contracts(
+            [
+                Contract(
+                    "d",
+                    date.fromisoformat("2021-01-01"),
+                    date.fromisoformat("2021-12-31"),
+                    10,
+                )
+            ]
+        )
+
+        for id, arr_events, arr_timeline in sort.iter_customer_arr():
+            contracts = [c for c in create_contracts() if c.customer_id == id]
+            if id == "d":
+                assert len(arr_events) == 2
+                continue
+            expected = ArrEventStream(ContractEventStream(contracts))
+            assert list(arr_events) == list(expected)
+            assert list(arr_timeline) == list(ArrIntervalTimeline(expected))
+
+
+def test_close_removes_runs(tmp_path):
+    sort = ExternalContractEventSort(run_size=1, directory=str(tmp_path))
+    sort.add_contracts(create_contracts())
+    assert sort.run_count == 1
+    assert len(os.listdir(tmp_path)) == 1
+
+    sort.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_iter_customer_intervals():
+    with ExternalContractEventSort(run_size=4) as sort:
+        sort.add_contracts(create_contracts())
+        customer_intervals = [
+            (id, list(intervals)) for id, intervals in sort.iter_customer_intervals()
+        ]
+
+    for id, intervals in customer_intervals:
+        arr_events = ArrEventStream(ContractEventStream(customer_contracts(id)))
+        assert intervals == list(ArrIntervalTimeline(arr_events))
@@ -0,0 +1,122 @@
+from saasy.instrumentation import PipelineStats
+from saasy.models import (
+    Contract,
+    ContractEventStream,
+    ArrEventStream,
+    ArrEventType,
+    SaasData,
+    compute_arr,
+)
+from datetime import date
+import pickle
+import pytest
+
+
+def create_contracts() -> list[Contract]:
+    return [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+        Contract(
+            "b", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "b", date.fromisoformat("2020-12-30"), date.fromisoformat("2021-12-31"), 75
+        ),
+    ]
+
+
+def test_branch_counts():
+    stats = PipelineStats()
+    ArrEventStream(ContractEventStream(create_contracts()[:2]), stats)
+
+    assert stats.branches == {"new": 1, "renewal": 1, "churn": 2}
+
+
+def test_stats_only_record_construction():
+    contracts = create_contracts()
+    stats = PipelineStats()
+    arr_events = ArrEventStream(ContractEventStream(contracts[:1]), stats)
+    arr_events.add_contracts(contracts[1:2])
+
+    assert stats.branches == {"new": 1, "churn": 1}
+    assert b"PipelineStats" not in pickle.dumps(arr_events)
+
+
+def test_iter_events_stats():
+    stats = PipelineStats()
+    contract_events = ContractEventStream(create_contracts()[:2])
+    list(ArrEventStream.iter_events(iter(contract_events), stats))
+
+    assert stats.branches == {"new": 1, "renewal": 1, "churn": 2}
+
+
+def test_arr_event_stream_stage_counts_contract_events():
+    renewal = [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 100
+        ),
+    ]
+    stats = PipelineStats()
+    arr_events, _ = compute_arr(renewal, stats)
+
+    assert len(arr_events) == 3
+    assert stats.stages["arr_event_stream"].items == 4
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_compute_stats(max_workers):
+    stats = PipelineStats(slowest_count=1)
+    data = SaasData(create_contracts())
+    data.compute(max_workers=max_workers, stats=stats)
+
+    assert stats.stages["contract_event_stream"].calls == 2
+    assert stats.stages["contract_event_stream"].items == 8
+    assert stats.stages["arr_event_stream"].items == 8
+    assert stats.arr_events == {
+        ArrEventType.New: 2,
+        ArrEventType.Renewal: 2,
+        ArrEventType.Expansion: 1,
+        ArrEventType.Downsell: 1,
+        ArrEventType.Churn: 2,
+    }
+    assert stats.branches["early_renewal"] == 1
+    assert len(stats.slowest_customers()) == 1
+    assert stats.slowest_customers()[0][0] in ("a", "b")
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_stage_callback(max_workers):
+    calls = []
+    stats = PipelineStats()
+    stats.add_callback(lambda name, seconds, items: calls.append((name, items)))
+    SaasData(create_contracts()).compute(max_workers=max_workers, stats=stats)
+
+    # Each customer reports its stages in order
+    assert calls[:3] == [
+        ("contract_event_stream", 4),
+        ("arr_event_stream", 4),
+        ("arr_interval_timeline", 4),
+    ]
+    assert [name for name, _ in calls] == [name for name, _ in calls[:3]] * 2
+    for name, stage in stats.stages.items():
+        assert sum(items for n, items in calls if n == name) == stage.items
+
+
+def test_to_dict():
+    stats = PipelineStats()
+    SaasData(create_contracts()).compute(max_workers=1, stats=stats)
+    report = stats.to_dict()
+
+    assert report["arr_events"]["Churn"] == 2
+    assert set(report["stages"]) == {
+        "contract_event_stream",
+        "arr_event_stream",
+        "arr_interval_timeline",
+    }
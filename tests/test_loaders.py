@@ -0,0 +1,85 @@
+from saasy.loaders import (
+    iter_contract_batches,
+    iter_csv_contracts,
+    iter_jsonl_contracts,
+    load_saas_data,
+)
+from saasy.models import Contract
+from datetime import date
+import json
+import pytest
+
+
+def create_contracts() -> list[Contract]:
+    return [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "b", date.fromisoformat("2020-03-01"), date.fromisoformat("2021-02-28"), 300
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+    ]
+
+
+def write_csv(path, contracts):
+    lines = ["customer_id,start_date,end_date,tcv"]
+    lines += [f"{c.customer_id},{c.start_date},{c.end_date},{c.tcv}" for c in contracts]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def write_jsonl(path, contracts):
+    records = [
+        {
+            "customer_id": c.customer_id,
+            "start_date": c.start_date.isoformat(),
+            "end_date": c.end_date.isoformat(),
+            "tcv": c.tcv,
+        }
+        for c in contracts
+    ]
+    path.write_text("\n".join(json.dumps(r) for r in records) + "\n")
+
+
+def test_csv_batches(tmp_path):
+    path = tmp_path / "contracts.csv"
+    write_csv(path, create_contracts())
+
+    batches = list(iter_csv_contracts(path, chunk_size=2))
+
+    assert [len(b) for b in batches] == [2, 1]
+    assert [c for b in batches for c in b] == create_contracts()
+
+
+def test_jsonl_batches(tmp_path):
+    path = tmp_path / "contracts.jsonl"
+    write_jsonl(path, create_contracts())
+
+    batches = list(iter_jsonl_contracts(path, chunk_size=2))
+
+    assert [c for b in batches for c in b] == create_contracts()
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        iter_contract_batches(tmp_path / "contracts.parquet")
+
+
+def test_invalid_record(tmp_path):
+    path = tmp_path / "contracts.csv"
+    path.write_text("customer_id,start_date,end_date,tcv\na,2020-01-01,bad,100\n")
+
+    with pytest.raises(ValueError):
+        list(iter_csv_contracts(path))
+
+
+def test_load_saas_data(tmp_path):
+    path = tmp_path / "contracts.csv"
+    write_csv(path, create_contracts())
+
+    saas_data = load_saas_data(path, chunk_size=1)
+
+    assert sorted(saas_data) == ["a", "b"]
+    assert [c.tcv for c in saas_data["a"].contracts] == [100, 150]
@@ -0,0 +1,160 @@
+from saasy.models import (
+    Contract,
+    ContractEventStream,
+    ArrEventStream,
+    ArrInterval,
+    ArrIntervalTimeline,
+    SaasData,
+)
+from saasy.portfolio import ArrSnapshotIndex, PortfolioArrTimeline
+from datetime import date, timedelta
+import portion as P
+
+
+def create_timelines() -> list[ArrIntervalTimeline]:
+    contracts = [
+        [
+            Contract(
+                "a",
+                date.fromisoformat("2020-01-01"),
+                date.fromisoformat("2020-12-31"),
+                100,
+            ),
+            Contract(
+                "a",
+                date.fromisoformat("2021-01-01"),
+                date.fromisoformat("2021-12-31"),
+                150,
+            ),
+        ],
+        [
+            Contract(
+                "b",
+                date.fromisoformat("2020-07-01"),
+                date.fromisoformat("2021-06-30"),
+                50,
+            ),
+        ],
+    ]
+    return [
+        ArrIntervalTimeline(ArrEventStream(ContractEventStream(c))) for c in contracts
+    ]
+
+
+def test_matches_sum_of_customers():
+    timelines = create_timelines()
+    portfolio = PortfolioArrTimeline(timelines)
+    dates = [date.fromisoformat("2019-12-01") + timedelta(days=i) for i in range(900)]
+
+    expected = [sum(t[d].arr for t in timelines) for d in dates]
+
+    assert [portfolio[d].arr for d in dates] == expected
+    assert portfolio.arr_at(reversed(dates)) == expected[::-1]
+
+
+def test_intervals():
+    portfolio = PortfolioArrTimeline(create_timelines())
+
+    assert list(portfolio) == [
+        ArrInterval(P.open(-P.inf, date.fromisoformat("2020-01-01")), 0),
+        ArrInterval(
+            P.closedopen(
+                date.fromisoformat("2020-01-01"), date.fromisoformat("2020-07-01")
+            ),
+            100,
+        ),
+        ArrInterval(
+            P.closedopen(
+                date.fromisoformat("2020-07-01"), date.fromisoformat("2021-01-01")
+            ),
+            150,
+        ),
+        ArrInterval(
+            P.closedopen(
+                date.fromisoformat("2021-01-01"), date.fromisoformat("2021-07-01")
+            ),
+            200,
+        ),
+        ArrInterval(
+            P.closedopen(
+                date.fromisoformat("2021-07-01"), date.fromisoformat("2022-01-01")
+            ),
+            150,
+        ),
+        ArrInterval(P.closedopen(date.fromisoformat("2022-01-01"), P.inf), 0),
+    ]
+
+
+def test_empty_portfolio():
+    portfolio = PortfolioArrTimeline([])
+
+    assert list(portfolio) == [ArrInterval(P.open(-P.inf, P.inf), 0)]
+    assert portfolio[date.fromisoformat("2020-01-01")].arr == 0
+
+
+def test_snapshot_index():
+    timelines = create_timelines()
+    index = ArrSnapshotIndex({"a": timelines[0], "b": timelines[1], "c": timelines[1]})
+    dates = [date.fromisoformat("2019-12-01") + timedelta(days=i) for i in range(900)]
+
+    assert index.customer_ids == ["a", "b", "c"]
+    for d in dates:
+        expected = [timelines[0][d].arr, timelines[1][d].arr, timelines[1][d].arr]
+        assert index.customer_arr(d).tolist() == expected
+        assert index.total_arr(d) == sum(expected)
+
+
+def test_snapshot_index_from_saas_data():
+    data = SaasData(
+        [
+            Contract(
+                "a",
+                date.fromisoformat("2020-01-01"),
+                date.fromisoformat("2020-12-31"),
+                100,
+            ),
+            Contract(
+                "b",
+                date.fromisoformat("2020-07-01"),
+                date.fromisoformat("2021-06-30"),
+                50,
+            ),
+        ]
+    )
+    index = ArrSnapshotIndex.from_saas_data(data)
+
+    assert index.customer_arr(date.fromisoformat("2020-08-01")).tolist() == [100, 50]
+    assert index.total_arr(date.fromisoformat("2021-01-01")) == 50
+    assert index.total_arr(date.fromisoformat("2019-01-01")) == 0
+
+
+def test_apply_amendments():
+    contracts = [
+        Contract(
+            "a", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 150
+        ),
+        Contract(
+            "b", date.fromisoformat("2020-07-01"), date.fromisoformat("2021-06-30"), 50
+        ),
+    ]
+    data = SaasData(contracts)
+    portfolio = PortfolioArrTimeline(c.arr_timeline for c in data.values())
+    index = ArrSnapshotIndex.from_saas_data(data)
+    amended = Contract(
+        "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-09-30"), 150
+    )
+    amendments = data.update_contracts([(contracts[1], amended)])
+    amendments += data.remove_contracts(contracts[2:])
+    portfolio.apply(amendments)
+    index.apply(amendments)
+
+    expected = PortfolioArrTimeline(c.arr_timeline for c in data.values())
+    dates = [date.fromisoformat("2019-12-01") + timedelta(days=i) for i in range(900)]
+    assert list(portfolio) == list(expected)
+    for d in dates:
+        arr = data["a"].arr_timeline[d].arr
+        assert index.customer_arr(d).tolist() == [arr, 0]
+        assert index.total_arr(d) == arr
@@ -0,0 +1,269 @@
+from saasy.models import (
+    Contract,
+    ContractEventStream,
+    ContractEventType,
+    ArrEventStream,
+    ArrEventType,
+    ArrStateError,
+    SaasData,
+)
+from datetime import date
+import pytest
+
+
+def test_groups_contracts_by_customer(create_contracts):
+    data = SaasData(create_contracts())
+
+    assert sorted(data) == ["a", "b", "c"]
+    assert [c.tcv for c in data["a"].contracts] == [100, 150]
+
+
+def test_customer_rejects_other_customers_contracts(create_contracts):
+    data = SaasData(create_contracts())
+
+    with pytest.raises(ValueError):
+        data["a"].add_contracts(create_contracts()[1:2])
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_compute(max_workers, create_contracts):
+    contracts = create_contracts()
+    data = SaasData(contracts)
+    data.compute(max_workers=max_workers, chunksize=1)
+
+    for customer_id, customer in data.items():
+        customer_contracts = [c for c in contracts if c.customer_id == customer_id]
+        expected = list(ArrEventStream(ContractEventStream(customer_contracts)))
+        assert customer.is_computed
+        assert list(customer.arr_events) == expected
+
+    assert data["a"].arr_timeline[date.fromisoformat("2021-06-01")].arr == 150
+
+
+def test_add_contracts_updates_customer(create_contracts):
+    data = SaasData(create_contracts())
+    data.compute(max_workers=1)
+    data.add_contracts(
+        [
+            Contract(
+                "c",
+                date.fromisoformat("2021-06-01"),
+                date.fromisoformat("2022-05-31"),
+                25,
+            )
+        ]
+    )
+
+    assert data["c"].is_computed
+    assert data["c"].arr_timeline[date.fromisoformat("2021-06-01")].arr == 75
+
+
+def test_arr_matrix(create_contracts):
+    data = SaasData(create_contracts())
+    start, end = date.fromisoformat("2019-12-01"), date.fromisoformat("2022-07-01")
+
+    matrix = data.arr_matrix(start, end, freq="M")
+
+    assert matrix.shape == (3, 31)
+    for row, customer in zip(matrix, data.values()):
+        assert (
+            row.tolist()
+            == customer.arr_timeline.to_series(start, end, freq="M").tolist()
+        )
+    assert matrix[:, 12].tolist() == [100, 300, 0]
+
+
+def test_computes_lazily(create_contracts):
+    data = SaasData(create_contracts())
+
+    assert not data["a"].is_computed
+    assert data["a"].arr_timeline[date.fromisoformat("2021-06-01")].arr == 150
+    assert data["a"].is_computed
+    assert not data["b"].is_computed
+    assert data.arr_cache.misses == 1
+
+
+def test_arr_cache_evicts_least_recently_used(create_contracts):
+    data = SaasData(create_contracts(), max_computed_customers=2)
+    data["a"].arr_events
+    data["b"].arr_events
+    data["a"].arr_events
+    data["c"].arr_events
+
+    assert data["a"].is_computed
+    assert not data["b"].is_computed
+    assert data["c"].is_computed
+    assert len(data.arr_cache) == 2
+    assert (data.arr_cache.hits, data.arr_cache.misses) == (1, 3)
+    assert data.arr_cache.evictions == 1
+
+    expected = list(data["b"].arr_events)
+    assert data.arr_cache.misses == 4
+    assert not data["a"].is_computed
+    assert expected == list(
+        ArrEventStream(ContractEventStream(create_contracts()[1:2]))
+    )
+
+
+def test_arr_cache_bytes_bound(create_contracts):
+    data = SaasData(create_contracts(), max_computed_bytes=1)
+    for customer in data.values():
+        customer.arr_timeline
+
+    assert len(data.arr_cache) == 1
+    assert data.arr_cache.evictions == 2
+
+
+def test_add_contracts_invalidates_evicted_customer(create_contracts):
+    data = SaasData(create_contracts(), max_computed_customers=1)
+    data["a"].arr_events
+    data["b"].arr_events
+    data.add_contracts(
+        [
+            Contract(
+                "a",
+                date.fromisoformat("2022-01-01"),
+                date.fromisoformat("2022-12-31"),
+                200,
+            )
+        ]
+    )
+
+    assert not data["a"].is_computed
+    assert data["a"].arr_timeline[date.fromisoformat("2022-06-01")].arr == 200
+
+
+def create_corrupt_contracts() -> list[Contract]:
+    # Co-terminating contracts drive current arr negative in the state machine
+    return [
+        Contract(
+            "d", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "d", date.fromisoformat("2020-06-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "d", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-06-01"), 10
+        ),
+    ]
+
+
+def test_compute_raises_arr_state_error():
+    data = SaasData(create_corrupt_contracts())
+
+    with pytest.raises(ArrStateError) as e:
+        data.compute(max_workers=1)
+    assert e.value.contract_event.contract == create_corrupt_contracts()[2]
+    assert e.value.curr_arr < 0
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_compute_isolated(max_workers, create_contracts):
+    invalid = [
+        Contract(
+            "e", date.fromisoformat("2021-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "f", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 0
+        ),
+        Contract(
+            "g", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-01-05"), 10
+        ),
+    ]
+    data = SaasData(create_contracts() + create_corrupt_contracts() + invalid)
+    diagnostics = data.compute_isolated(max_workers=max_workers, chunksize=1)
+
+    assert [(d.customer_id, d.message) for d in diagnostics] == [
+        ("e", "Invalid contract: EndBeforeStart"),
+        ("f", "Invalid contract: NonPositiveTcv"),
+        ("g", "Invalid contract: ZeroLength"),
+        ("d", "Current arr creating ArrEventStream goes negative"),
+    ]
+    assert diagnostics[0].contract == invalid[0]
+    assert diagnostics[3].contract_event.event_type is ContractEventType.Start
+    assert diagnostics[3].contract == create_corrupt_contracts()[2]
+    assert diagnostics[3].curr_arr < 0
+    assert diagnostics[3].prev_arr_event.event_type is ArrEventType.Downsell
+    assert [id for id, c in data.items() if c.is_computed] == ["a", "b", "c"]
+
+
+def test_update_contracts(create_contracts):
+    contracts = create_contracts()
+    amended = Contract(
+        "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 300
+    )
+    data = SaasData(contracts)
+    data.compute(max_workers=1)
+    [amendment] = data.update_contracts([(contracts[2], amended)])
+
+    expected = ArrEventStream(ContractEventStream([contracts[0], amended]))
+    assert list(data["a"].arr_events) == list(expected)
+    assert amendment.customer_id == "a"
+    assert amendment.from_date == date.fromisoformat("2021-01-01")
+    assert amendment.old_change_points == [
+        (date.fromisoformat("2021-01-01").toordinal(), 50),
+        (date.fromisoformat("2022-01-01").toordinal(), -150),
+    ]
+    assert amendment.new_change_points == [
+        (date.fromisoformat("2021-01-01").toordinal(), 200),
+        (date.fromisoformat("2022-01-01").toordinal(), -300),
+    ]
+
+
+def test_update_contracts_is_all_or_nothing(create_contracts):
+    contracts = create_contracts()
+    valid = create_corrupt_contracts()
+    valid[1] = Contract(
+        "d", date.fromisoformat("2020-06-01"), date.fromisoformat("2020-11-30"), 100
+    )
+    amended = Contract(
+        "a", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-12-31"), 300
+    )
+    data = SaasData(contracts + valid)
+    data.compute(max_workers=1)
+    expected = {
+        customer_id: list(data[customer_id].arr_events) for customer_id in ("a", "d")
+    }
+
+    with pytest.raises(ArrStateError):
+        data.update_contracts(
+            [(contracts[2], amended), (valid[1], create_corrupt_contracts()[1])]
+        )
+    assert data["a"].contracts == [contracts[0], contracts[2]]
+    assert data["d"].contracts == valid
+    for customer_id, arr_events in expected.items():
+        assert list(data[customer_id].arr_events) == arr_events
+
+
+def test_update_contracts_rejects_other_customer(create_contracts):
+    contracts = create_contracts()
+    data = SaasData(contracts)
+
+    with pytest.raises(ValueError):
+        data.update_contracts([(contracts[0], contracts[1])])
+
+
+def test_remove_contracts(create_contracts):
+    contracts = create_contracts()
+    data = SaasData(contracts)
+    amendments = data.remove_contracts([contracts[0], contracts[3]])
+
+    assert sorted(data) == ["a", "b"]
+    assert list(data["a"].contracts) == [contracts[2]]
+    assert list(data["a"].arr_events) == list(
+        ArrEventStream(ContractEventStream([contracts[2]]))
+    )
+    assert [(a.customer_id, a.from_date) for a in amendments] == [
+        ("a", date.fromisoformat("2020-01-01")),
+        ("c", date.fromisoformat("2021-06-01")),
+    ]
+    assert amendments[1].new_change_points == []
+
+
+def test_remove_missing_contract(create_contracts):
+    contracts = create_contracts()
+    data = SaasData(contracts[:2])
+
+    with pytest.raises(ValueError):
+        data.remove_contracts(contracts[2:3])
+    assert list(data["a"].contracts) == contracts[:1]
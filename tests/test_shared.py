@@ -0,0 +1,68 @@
+from saasy.models import (
+    Contract,
+    ContractEventStream,
+    ArrEventStream,
+    ArrIntervalTimeline,
+    ArrStateError,
+    SaasData,
+)
+from saasy.shared import SharedContractStore, compute_shared
+from datetime import date
+import os
+import pytest
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_compute_shared(max_workers, tmp_path, create_contracts):
+    contracts = create_contracts()
+    data = SaasData(contracts)
+    diagnostics = compute_shared(
+        data, max_workers=max_workers, chunksize=1, directory=tmp_path
+    )
+
+    assert diagnostics == []
+    assert os.listdir(tmp_path) == []
+    for customer_id, customer in data.items():
+        customer_contracts = [c for c in contracts if c.customer_id == customer_id]
+        expected = ArrEventStream(ContractEventStream(customer_contracts))
+        assert customer.is_computed
+        assert list(customer.arr_events) == list(expected)
+        assert list(customer.arr_timeline) == list(ArrIntervalTimeline(expected))
+
+
+def test_compute_shared_reports_failed_customers(create_contracts):
+    corrupt = [
+        Contract(
+            "d", date.fromisoformat("2020-01-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "d", date.fromisoformat("2020-06-01"), date.fromisoformat("2020-12-31"), 100
+        ),
+        Contract(
+            "d", date.fromisoformat("2021-01-01"), date.fromisoformat("2021-06-01"), 10
+        ),
+    ]
+    data = SaasData(create_contracts() + corrupt)
+    [diagnostic] = compute_shared(data, max_workers=1)
+
+    assert diagnostic.customer_id == "d"
+    assert diagnostic.contract == corrupt[2]
+    assert diagnostic.curr_arr is not None and diagnostic.curr_arr < 0
+    assert diagnostic == data.compute_isolated(max_workers=1)[0]
+    assert [id for id, c in data.items() if not c.is_computed] == ["d"]
+    with pytest.raises(ArrStateError):
+        data["d"].arr_events
+
+
+def test_store_groups_contracts_by_customer(tmp_path, create_contracts):
+    customers = list(SaasData(create_contracts()).values())
+    with SharedContractStore.from_customers(customers, str(tmp_path)) as store:
+        attached = SharedContractStore(
+            store.path, store.customer_count, store.contract_count
+        )
+
+        assert attached["customer_offsets"].tolist() == [0, 2, 3, 4]
+        assert attached["tcv"].tolist() == [100, 150, 300, 50]
+        attached.close()
+
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,86 @@
+from saasy.models import Contract, SaasData
+from saasy.snapshot import load_snapshot, save_snapshot
+from datetime import date, timedelta
+import json
+import os
+import pickle
+import pytest
+
+
+def test_round_trip(tmp_path, create_contracts):
+    data = SaasData(create_contracts())
+    data["a"].arr_timeline
+    data["b"].arr_timeline
+    save_snapshot(data, tmp_path / "snapshot")
+
+    loaded = load_snapshot(tmp_path / "snapshot")
+
+    assert list(loaded) == ["a", "b", "c"]
+    assert [id for id, c in loaded.items() if c.is_computed] == ["a", "b"]
+    for customer_id, customer in data.items():
+        assert list(loaded[customer_id].contracts) == list(customer.contracts)
+        assert loaded[customer_id].contracts[-1:] == customer.contracts[-1:]
+        assert list(loaded[customer_id].arr_events) == list(customer.arr_events)
+        assert list(loaded[customer_id].arr_timeline) == list(customer.arr_timeline)
+
+
+def test_loaded_customer_can_add_contracts(tmp_path, create_contracts):
+    save_snapshot(SaasData(create_contracts()), tmp_path / "snapshot")
+    new_contract = Contract(
+        "a", date.fromisoformat("2022-01-01"), date.fromisoformat("2022-12-31"), 200
+    )
+    loaded = load_snapshot(tmp_path / "snapshot")
+    loaded.add_contracts([new_contract])
+
+    expected = SaasData(create_contracts() + [new_contract])
+    assert list(loaded["a"].contracts) == list(expected["a"].contracts)
+    assert list(loaded["a"].arr_events) == list(expected["a"].arr_events)
+
+
+def test_pickle_loaded_contracts(tmp_path, create_contracts):
+    other = [
+        Contract("z", date(2000, 1, 1) + timedelta(days=i), date(2030, 1, 1), 10)
+        for i in range(5000)
+    ]
+    save_snapshot(SaasData(create_contracts() + other), tmp_path / "snapshot")
+    contracts = load_snapshot(tmp_path / "snapshot")["a"].contracts
+
+    # Only the customer's own contracts are pickled
+    assert pickle.loads(pickle.dumps(contracts)) == list(contracts)
+    assert len(pickle.dumps(contracts)) < 2 * len(pickle.dumps(list(contracts)))
+
+
+def test_compute_loaded_in_workers(tmp_path, create_contracts):
+    save_snapshot(SaasData(create_contracts()), tmp_path / "snapshot")
+    loaded = load_snapshot(tmp_path / "snapshot")
+    loaded.compute(max_workers=2)
+
+    expected = SaasData(create_contracts())
+    for customer_id, customer in expected.items():
+        assert list(loaded[customer_id].arr_events) == list(customer.arr_events)
+
+
+def test_empty_snapshot(tmp_path):
+    save_snapshot(SaasData(), tmp_path / "snapshot")
+
+    assert len(load_snapshot(tmp_path / "snapshot")) == 0
+
+
+def test_existing_path_is_not_overwritten(tmp_path, create_contracts):
+    (tmp_path / "snapshot").mkdir()
+    (tmp_path / "snapshot" / "other").write_text("")
+
+    with pytest.raises(OSError):
+        save_snapshot(SaasData(create_contracts()), tmp_path / "snapshot")
+    assert os.listdir(tmp_path) == ["snapshot"]
+
+
+def test_unsupported_version(tmp_path, create_contracts):
+    save_snapshot(SaasData(create_contracts()), tmp_path / "snapshot")
+    manifest_path = tmp_path / "snapshot" / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    manifest["version"] += 1
+    manifest_path.write_text(json.dumps(manifest))
+
+    with pytest.raises(ValueError):
+        load_snapshot(tmp_path / "snapshot")